@@ -1,6 +1,18 @@
-from datasets import load_dataset
-import os
+# Run from the repository root: python -m data.dblp.split_and_save_json ...
 import argparse
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+from queue import Empty, Full
+from typing import IO, Iterable, Iterator
+
+from src.dataset.flatten import _iter_json_array, _open
+
+SPLITS = ("train", "validation", "test")
+
 
 def create_splits(
     dataset_name: str,
@@ -11,6 +23,8 @@ def create_splits(
     val_frac: float,
     output_dir: str
 ):
+    from datasets import load_dataset
+
     # 1. Load and optionally truncate
     ds = load_dataset(dataset_name, split=split_name)
     ds = ds.shuffle(seed)
@@ -43,21 +57,390 @@ def create_splits(
     print(f"Saved {len(val_ds)}   validation → {val_path}")
     print(f"Saved {len(test_ds)}  test → {test_path}")
 
+
+# --- streaming mode -----------------------------------------------------------
+# Records are read one at a time (local JSONL/JSON/CSV files, optionally .gz, or
+# the HF dataset with streaming=True) and assigned to a split by a hash of
+# (seed, stratum, id), so no global shuffle is needed, the same record always
+# lands in the same split whatever the input order or sharding, and adding
+# records never moves existing ones. Exact per-stratum quotas
+# (`StratifiedSplitter`) are opt-in, because they depend on the input order.
+# Each split is written by its own process from a bounded queue, so memory
+# stays bounded by the queue and shard sizes whatever the input size.
+
+def split_of(record_id, seed: int, train_frac: float, val_frac: float, stratum: str = "") -> str:
+    """
+    Deterministic split for a record id. The stratum salts the hash, so each
+    stratum gets its own draw at the same ratios: every stratum is split
+    train_frac / val_frac / rest in expectation, with sampling noise that
+    only matters for small strata.
+    """
+    digest = hashlib.blake2b(f"{seed}\x1f{stratum}\x1f{record_id}".encode("utf-8"), digest_size=8).digest()
+    u = int.from_bytes(digest, "big") / 2 ** 64
+    if u < train_frac:
+        return "train"
+    if u < train_frac + val_frac:
+        return "validation"
+    return "test"
+
+
+class StratifiedSplitter:
+    """
+    Opt-in exact per-stratum quotas (`balance_strata`). Unlike `split_of`,
+    a record's split depends on how many records of its stratum came before
+    it, so reordering or re-sharding the input moves records between splits.
+
+    Each record goes to the split furthest below its
+    target share of the records seen so far in its stratum, so every stratum
+    (e.g. level-1 label) is split train_frac / val_frac / rest to within one
+    record at any point of the stream. Ties go in an order drawn from (seed,
+    stratum), so small strata do not all send their first held-out record to
+    the same split. Deterministic for a given input order; appending records
+    never moves earlier ones. `counts` holds {stratum: {split: rows}}.
+    """
+
+    def __init__(self, seed: int, train_frac: float, val_frac: float):
+        self.seed = seed
+        self.fractions = {"train": train_frac, "validation": val_frac, "test": 1 - train_frac - val_frac}
+        self.counts: dict[str, dict[str, int]] = {}
+        self._tie_break: dict[str, dict[str, bytes]] = {}
+
+    def assign(self, stratum: str) -> str:
+        counts = self.counts.get(stratum)
+        if counts is None:
+            counts = self.counts[stratum] = dict.fromkeys(SPLITS, 0)
+            self._tie_break[stratum] = {
+                split: hashlib.blake2b(f"{self.seed}\x1f{stratum}\x1f{split}".encode("utf-8"), digest_size=8).digest()
+                for split in SPLITS
+            }
+        seen = sum(counts.values()) + 1
+        tie_break = self._tie_break[stratum]
+        # rounded so that float noise in the fractions does not decide ties
+        split = max(SPLITS, key=lambda s: (round(self.fractions[s] * seen - counts[s], 9), tie_break[s]))
+        counts[split] += 1
+        return split
+
+
+def get_field(record: dict, path: str | None):
+    """
+    Value at a dotted path ("response.prediction"); the first element of a
+    list value; None when absent.
+    """
+    if not path:
+        return None
+    value = record
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
+def iter_local_records(path: str) -> Iterator[dict]:
+    """
+    One record at a time from a .jsonl/.json/.csv file (optionally .gz). A
+    .json file must be JSON Lines or a top-level array of records.
+    """
+    base = path[:-3] if path.endswith(".gz") else path
+    with _open(path, "r") as f:
+        if base.endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if first == "[":
+            f.seek(0)
+            yield from _iter_json_array(f)
+            return
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield json.loads(line)
+            line = f.readline()
+
+
+def iter_hf_records(dataset_name: str, split_name: str) -> Iterator[dict]:
+    from datasets import load_dataset
+
+    yield from load_dataset(dataset_name, split=split_name, streaming=True)
+
+
+class _ShardWriter:
+    """
+    Rows to `<prefix>-<shard:05d>.jsonl[.gz]` or `.parquet`, `shard_size` rows
+    per shard. JSONL is written row by row; Parquet buffers one shard.
+    """
+
+    def __init__(self, prefix: str, shard_size: int, fmt: str, compress: bool):
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.fmt = fmt
+        self.compress = compress
+        self.paths: list[str] = []
+        self.rows = 0
+        self._file: IO | None = None
+        self._buffer: list[dict] = []
+        self._in_shard = 0
+
+    def _next_path(self) -> str:
+        suffix = ".parquet" if self.fmt == "parquet" else ".jsonl.gz" if self.compress else ".jsonl"
+        path = f"{self.prefix}-{len(self.paths):05d}{suffix}"
+        self.paths.append(path)
+        return path
+
+    def write(self, row: dict) -> None:
+        if self.fmt == "parquet":
+            self._buffer.append(row)
+            if len(self._buffer) >= self.shard_size:
+                self._flush_parquet()
+        else:
+            if self._file is None or self._in_shard >= self.shard_size:
+                if self._file is not None:
+                    self._file.close()
+                self._file = _open(self._next_path(), "w")
+                self._in_shard = 0
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._in_shard += 1
+        self.rows += 1
+
+    def _flush_parquet(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(self._buffer), self._next_path(),
+                       compression="zstd" if self.compress else "none")
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._buffer:
+            self._flush_parquet()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _write_split(prefix: str, shard_size: int, fmt: str, compress: bool, queue: mp.Queue, results: mp.Queue) -> None:
+    writer = _ShardWriter(prefix, shard_size, fmt, compress)
+    error = None
+    try:
+        while True:
+            batch = queue.get()
+            if batch is None:
+                break
+            for row in batch:
+                writer.write(row)
+    except Exception as e:
+        # reported through `results` so the parent aborts instead of waiting
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        try:
+            writer.close()
+        except Exception as e:
+            error = error or f"{type(e).__name__}: {e}"
+        results.put((os.path.basename(prefix), writer.rows, writer.paths, error))
+
+
+def _put(queue: mp.Queue, item, split: str, writer: mp.Process, results: mp.Queue, timeout: float = 1.0) -> None:
+    """
+    `queue.put` that gives up once the split's writer has died, instead of
+    blocking forever on a queue nobody drains. The error the writer reported
+    through `results`, if any, goes into the raised RuntimeError.
+    """
+    while True:
+        try:
+            queue.put(item, timeout=timeout)
+            return
+        except Full:
+            if writer.is_alive():
+                continue
+            reason = f"exited (code {writer.exitcode})"
+            try:
+                while True:
+                    name, _, _, error = results.get(timeout=timeout)
+                    if name == split and error:
+                        reason = f"failed: {error}"
+                        break
+            except Empty:
+                pass
+            raise RuntimeError(f"{split} writer {reason}") from None
+
+
+def _collect(results: mp.Queue, writers: dict[str, mp.Process], timeout: float = 1.0) -> dict:
+    """
+    Gather every writer's (split, rows, paths, error), raising on a reported
+    error or on a writer that exited without reporting.
+    """
+    summary = {"counts": {}, "paths": {}}
+    pending = dict(writers)
+    while pending:
+        try:
+            split, rows, paths, error = results.get(timeout=timeout)
+        except Empty:
+            dead = [split for split, writer in pending.items() if not writer.is_alive()]
+            if not dead:
+                continue
+            # a writer's report is flushed before it exits; allow one more wait for it
+            try:
+                split, rows, paths, error = results.get(timeout=timeout)
+            except Empty:
+                codes = ", ".join(f"{split} (code {pending[split].exitcode})" for split in dead)
+                raise RuntimeError(f"Writer process(es) exited without reporting: {codes}") from None
+        if error:
+            raise RuntimeError(f"{split} writer failed: {error}")
+        pending.pop(split)
+        summary["counts"][split] = rows
+        summary["paths"][split] = paths
+    return summary
+
+
+def create_splits_streaming(
+    records: Iterable[dict],
+    seed: int,
+    train_frac: float,
+    val_frac: float,
+    output_dir: str,
+    id_field: str = "id",
+    stratify_field: str | None = None,
+    balance_strata: bool = False,
+    size: int | None = None,
+    shard_size: int = 100_000,
+    fmt: str = "jsonl",
+    compress: bool = True,
+    batch_size: int = 1_000,
+    max_pending_batches: int = 8
+) -> dict:
+    """
+    Stream `records` into sharded train/validation/test files under `output_dir`.
+
+    Every record goes to `split_of(id, seed, ..., stratum)`, where the stratum
+    is the value at `stratify_field` (e.g. the level-1 label). With
+    `balance_strata`, `StratifiedSplitter` assigns exact per-stratum quotas
+    instead, which depend on the input order. The parent process only reads
+    and assigns; one writer process per
+    split serialises and compresses. At most `max_pending_batches` batches of
+    `batch_size` records wait per split (plus one Parquet shard per writer),
+    so memory does not grow with the input. If a writer fails or dies, the
+    remaining writers are stopped and a RuntimeError is raised.
+
+    Returns:
+        {"counts": {split: rows}, "paths": {split: [shard paths]},
+         "strata": {stratum: {split: rows}}} (strata only when stratifying).
+    """
+    if train_frac < 0 or val_frac < 0 or train_frac + val_frac > 1:
+        raise ValueError("train_frac and val_frac must be non-negative and sum to at most 1")
+    if fmt == "parquet":
+        import pyarrow  # noqa: F401  (fail before starting the writers)
+
+    os.makedirs(output_dir, exist_ok=True)
+    for split in SPLITS:
+        for stale in glob.glob(os.path.join(glob.escape(output_dir), f"{split}-[0-9][0-9][0-9][0-9][0-9].*")):
+            os.remove(stale)
+
+    results: mp.Queue = mp.Queue()
+    queues = {split: mp.Queue(maxsize=max_pending_batches) for split in SPLITS}
+    writers = {
+        split: mp.Process(target=_write_split, daemon=True,
+                          args=(os.path.join(output_dir, split), shard_size, fmt, compress, queues[split], results))
+        for split in SPLITS
+    }
+    for writer in writers.values():
+        writer.start()
+
+    batches: dict[str, list[dict]] = {split: [] for split in SPLITS}
+    splitter = StratifiedSplitter(seed, train_frac, val_frac) if stratify_field and balance_strata else None
+    strata: dict[str, dict[str, int]] = {}
+    skipped = 0
+    try:
+        for n, record in enumerate(records):
+            if size and n >= size:
+                break
+            record_id = record.get(id_field)
+            if record_id is None:
+                skipped += 1
+                continue
+            stratum = get_field(record, stratify_field)
+            stratum = "" if stratum is None else str(stratum)
+            if splitter is not None:
+                split = splitter.assign(stratum)
+            else:
+                split = split_of(record_id, seed, train_frac, val_frac, stratum)
+                if stratify_field:
+                    counts = strata.setdefault(stratum, dict.fromkeys(SPLITS, 0))
+                    counts[split] += 1
+            batch = batches[split]
+            batch.append(record)
+            if len(batch) >= batch_size:
+                _put(queues[split], batch, split, writers[split], results)
+                batches[split] = []
+        for split in SPLITS:
+            if batches[split]:
+                _put(queues[split], batches[split], split, writers[split], results)
+            _put(queues[split], None, split, writers[split], results)
+        summary = _collect(results, writers)
+    except BaseException:
+        for writer in writers.values():
+            writer.terminate()
+        raise
+    for writer in writers.values():
+        writer.join()
+    if stratify_field:
+        summary["strata"] = splitter.counts if splitter is not None else strata
+    if skipped:
+        print(f"Skipped {skipped} records without '{id_field}'")
+    for split in SPLITS:
+        print(f"Saved {summary['counts'][split]} {split} → {len(summary['paths'][split])} shard(s) in {output_dir}")
+    return summary
+
+
 if __name__ == "__main__":
     p = argparse.ArgumentParser(description="Split DBLP Discovery into train/val/test JSONL")
-    p.add_argument("--size",      type=int,   default=100,  help="Total records to use (N).")
+    p.add_argument("--size",      type=int,   default=None, help="Total records to use (N); default 100, or all with --streaming.")
     p.add_argument("--seed",      type=int,   default=108,     help="Random seed for shuffle.")
     p.add_argument("--train_frac",type=float, default=0.8,    help="Fraction for train split.")
     p.add_argument("--val_frac",  type=float, default=0.1,    help="Fraction for validation split.")
     p.add_argument("--out_dir",   type=str,   default="data_splits", help="Where to write JSONL files.")
+    p.add_argument("--streaming", action="store_true", help="Hash-split records as they stream (no shuffle, bounded memory).")
+    p.add_argument("--inputs",    type=str,   nargs="*", default=None,
+                   help="Local .jsonl/.json/.csv[.gz] files to split instead of the HF dataset (implies --streaming).")
+    p.add_argument("--id_field",  type=str,   default="id", help="Record key hashed to pick the split.")
+    p.add_argument("--stratify_field", type=str, default=None,
+                   help="Dotted key of the level-1 label to stratify by, e.g. response.prediction.")
+    p.add_argument("--balance_strata", action="store_true",
+                   help="Exact per-stratum quotas; splits then depend on the input order.")
+    p.add_argument("--shard_size", type=int,  default=100_000, help="Rows per output shard.")
+    p.add_argument("--format",    type=str,   default="jsonl", choices=["jsonl", "parquet"])
+    p.add_argument("--no_compress", action="store_true", help="Write plain .jsonl / uncompressed Parquet.")
     args = p.parse_args()
 
-    create_splits(
-        dataset_name="jpwahle/dblp-discovery-dataset",
-        split_name="train",
-        size=args.size,
-        seed=args.seed,
-        train_frac=args.train_frac,
-        val_frac=args.val_frac,
-        output_dir=args.out_dir
-    )
+    if args.streaming or args.inputs:
+        if args.inputs:
+            records = (record for path in args.inputs for record in iter_local_records(path))
+        else:
+            records = iter_hf_records("jpwahle/dblp-discovery-dataset", "train")
+        create_splits_streaming(
+            records,
+            seed=args.seed,
+            train_frac=args.train_frac,
+            val_frac=args.val_frac,
+            output_dir=args.out_dir,
+            id_field=args.id_field,
+            stratify_field=args.stratify_field,
+            balance_strata=args.balance_strata,
+            size=args.size,
+            shard_size=args.shard_size,
+            fmt=args.format,
+            compress=not args.no_compress
+        )
+    else:
+        create_splits(
+            dataset_name="jpwahle/dblp-discovery-dataset",
+            split_name="train",
+            size=100 if args.size is None else args.size,
+            seed=args.seed,
+            train_frac=args.train_frac,
+            val_frac=args.val_frac,
+            output_dir=args.out_dir
+        )
@@ -0,0 +1,114 @@
+# bench_proxy.py
+# Measures the latency llm_route_proxy adds on top of its upstream: starts the
+# stub upstream and the proxy as subprocesses, then fires the same chat
+# completion load at both and compares percentiles.
+#
+#   python -m llms.bench_proxy --requests 2000 --concurrency 64
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BODY = {
+    "model": "stub",
+    "messages": [
+        {"role": "system", "content": "You are an assistant"},
+        {"role": "user", "content": "Classify this abstract."},
+    ],
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_server(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up")
+                await asyncio.sleep(0.1)
+
+
+async def run_load(url: str, requests: int, concurrency: int) -> list[float]:
+    """
+    Send `requests` POSTs with at most `concurrency` in flight; returns latencies in ms.
+    """
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def one(i: int):
+            # distinct bodies, so the proxy's single-flight never merges them
+            # and every request pays the full forwarding path
+            body = {**BODY, "user": f"bench-{i}"}
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await client.post(url, json=body)
+                resp.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*[one(i) for i in range(requests)])
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    print(f"{name:<8} n={len(latencies):<6} p50={percentile(latencies, 50):8.2f} ms  "
+          f"p99={percentile(latencies, 99):8.2f} ms  mean={statistics.mean(latencies):8.2f} ms")
+
+
+async def main(args) -> None:
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    proxy_url = f"http://127.0.0.1:{args.proxy_port}"
+    stub = start_server("llms.stub_server", args.stub_port, {"STUB_LATENCY_MS": str(args.latency_ms)})
+    proxy = start_server("llms.llm_route_proxy", args.proxy_port, {"LLM_ROUTER_URL": stub_url})
+    try:
+        await wait_until_up(f"{stub_url}/models")
+        await wait_until_up(f"{proxy_url}/v1/models")
+        # warm up connection pools on both paths
+        await run_load(f"{stub_url}/chat-completion", args.concurrency, args.concurrency)
+        await run_load(f"{proxy_url}/v1/chat/completions", args.concurrency, args.concurrency)
+
+        direct = await run_load(f"{stub_url}/chat-completion", args.requests, args.concurrency)
+        proxied = await run_load(f"{proxy_url}/v1/chat/completions", args.requests, args.concurrency)
+    finally:
+        for server in (proxy, stub):
+            server.terminate()
+            server.wait()
+
+    print(f"--- {args.requests} requests, concurrency {args.concurrency}, "
+          f"stub latency {args.latency_ms} ms ---")
+    report("direct", direct)
+    report("proxied", proxied)
+    print(f"added    p50={percentile(proxied, 50) - percentile(direct, 50):8.2f} ms  "
+          f"p99={percentile(proxied, 99) - percentile(direct, 99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Benchmark the latency added by llm_route_proxy")
+    p.add_argument("--requests",    type=int,   default=1000)
+    p.add_argument("--concurrency", type=int,   default=32)
+    p.add_argument("--latency_ms",  type=float, default=50, help="Simulated upstream latency.")
+    p.add_argument("--stub_port",   type=int,   default=4100)
+    p.add_argument("--proxy_port",  type=int,   default=4101)
+    asyncio.run(main(p.parse_args()))
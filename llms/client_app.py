@@ -1,16 +1,99 @@
 import asyncio
-import json
+import os
+import threading
 import uuid
 
 from openai import AsyncOpenAI  # 1. Import the Async client
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 import time
+from typing import Callable
 
-client = AsyncOpenAI(
-    base_url="http://localhost:4000",
-)
-token_counter = []
+from llms.rate_limit import RequestScheduler, is_retryable
+from llms.response_cache import ResponseCache
+from llms.single_flight import SingleFlight
+from llms.telemetry import TelemetryWriter
+from llms.tracing import Span, NoopSpan, tracer
+
+# The LiteLLM / route proxy the client talks to.
+BASE_URL = os.environ.get("LLM_BASE_URL", "http://localhost:4000")
+
+
+def create_client(base_url: str = BASE_URL, api_key: str | None = None) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        base_url=base_url,
+        # None falls back to OPENAI_API_KEY
+        api_key=api_key,
+        # retries are owned by `scheduler`, which also honours Retry-After and rate limits
+        max_retries=0,
+    )
+
+
+# Built on first use by get_client(), so importing this module (and the taggers
+# built on it) does not require OPENAI_API_KEY. Assign to override.
+client: AsyncOpenAI | None = None
+
+
+def get_client() -> AsyncOpenAI:
+    global client
+    if client is None:
+        client = create_client()
+    return client
 run_id = uuid.uuid4()
+# Running per-model totals: model -> {"calls", "prompt_tokens", "completion_tokens"}.
+# Per-call records go to the telemetry files instead of being kept in memory.
+token_totals: dict[str, dict[str, int]] = {}
+
+# Token counts and LLM interactions are appended as JSONL under this directory.
+TELEMETRY_DIR = os.environ.get("LLM_TELEMETRY_DIR", "./llm_logs")
+TELEMETRY_COMPRESS = os.environ.get("LLM_TELEMETRY_COMPRESS", "0").lower() in ("1", "true", "yes")
+_telemetry_writers: dict[str, TelemetryWriter] = {}
+
+# Responses are cached on disk, in ./llm_cache.sqlite unless LLM_CACHE_PATH names
+# another file, so re-running a notebook only pays for new prompts. Opt out with
+# LLM_CACHE_PATH="" (or per call with use_cache=False).
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "./llm_cache.sqlite")
+_response_cache: ResponseCache | None = None
+_response_cache_lock = threading.Lock()
+# Coalesces identical concurrent (non-streamed) requests into one upstream call.
+in_flight = SingleFlight()
+# Per-model rate limits, adaptive concurrency and retries for ask_model_plus,
+# e.g. scheduler.configure("gpt-4o", rpm=500, tpm=300_000, max_concurrency=16).
+scheduler = RequestScheduler()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """
+    Lazily open the process-wide response cache (None when caching is disabled).
+    """
+    global _response_cache
+    if _response_cache is None and CACHE_PATH:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(CACHE_PATH)
+    return _response_cache
+
+
+def get_telemetry_writer(kind: str) -> TelemetryWriter:
+    """
+    Lazily create the background writer for `kind` ("tokens" or "llm") of this run.
+    """
+    writer = _telemetry_writers.get(kind)
+    if writer is None:
+        writer = TelemetryWriter(
+            os.path.join(TELEMETRY_DIR, f"{run_id}_{kind}"),
+            compress=TELEMETRY_COMPRESS,
+        )
+        _telemetry_writers[kind] = writer
+    return writer
+
+
+async def close_telemetry() -> None:
+    """
+    Flush and stop the telemetry writers (also done automatically at exit).
+    """
+    writers = list(_telemetry_writers.values())
+    _telemetry_writers.clear()
+    await asyncio.gather(*[asyncio.to_thread(writer.close) for writer in writers])
 
 
 async def ask_model(model: str, prompt: str, system: str = "You are an assistant"):
@@ -20,7 +103,7 @@ async def ask_model(model: str, prompt: str, system: str = "You are an assistant
     print(f"--- Firing request to Model: {model} ---")
     try:
         # 4. Use 'await' for the non-blocking API call (method is 'acreate')
-        completion = await client.chat.completions.create(
+        completion = await get_client().chat.completions.create(
             model=model,
             messages=[
                 ChatCompletionSystemMessageParam(role="system", content=system),
@@ -36,60 +119,188 @@ async def ask_model(model: str, prompt: str, system: str = "You are an assistant
         print(f"{e}\n")
         print("-" * 25 + "\n")
 
-async def ask_model_plus(model: str, prompt: str, system: str = "You are an assistant", verbose: bool = False, track: bool = True):
-    try:
-        completion = await client.chat.completions.create(
-            model=model,
-            messages=[
-                ChatCompletionSystemMessageParam(role="system", content=system),
-                ChatCompletionUserMessageParam(role="user", content=prompt)
-            ],
-        )
+async def _stream_completion(model: str, messages: list, extra_params: dict, on_token: Callable[[str], None] | None):
+    """
+    Run a streamed chat completion, passing each content delta to `on_token` as it
+    arrives. Returns the full content and the usage reported in the final chunk.
+    """
+    stream = await get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **extra_params,
+    )
+    parts = []
+    usage = None
+    async for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            if on_token is not None:
+                on_token(delta)
+    return "".join(parts), usage
+
+
+async def ask_model_plus(model: str, prompt: str, system: str = "You are an assistant", verbose: bool = False, track: bool = True,
+                         max_tokens: int | None = None, use_cache: bool = True,
+                         stream: bool = False, on_token: Callable[[str], None] | None = None,
+                         raise_errors: bool = False):
+    """
+    Ask `model` a single system + user prompt and return the response text.
+
+    Calls go through `scheduler`: they wait for the model's request/token budget
+    and concurrency limit, and throttling, 5xx and connection errors are retried
+    with jittered back-off. If the call still fails, the error is printed and
+    None is returned, or re-raised with raise_errors=True.
+
+    With stream=True the completion is streamed through the proxy and every text
+    delta is handed to `on_token` as soon as it arrives; the full text is still
+    returned at the end. A cache hit is delivered to `on_token` as a single delta.
+    """
+    with tracer.span("llm_call", model=model) as span:
+        return await _ask_model(span, model, prompt, system, verbose, track, max_tokens,
+                                use_cache, stream, on_token, raise_errors)
+
+
+async def _ask_model(span: Span | NoopSpan, model: str, prompt: str, system: str, verbose: bool, track: bool,
+                     max_tokens: int | None, use_cache: bool, stream: bool,
+                     on_token: Callable[[str], None] | None, raise_errors: bool):
+    # Only send max_tokens when asked to, so the proxy default still applies otherwise.
+    extra_params = {"max_tokens": max_tokens} if max_tokens is not None else {}
+    request_key = ResponseCache.make_key(model, system, prompt, **extra_params)
+
+    # SQLite work (opening, lookups, writes, eviction) runs off the event loop;
+    # only the in-memory LRU is consulted inline.
+    cache = None
+    if use_cache and CACHE_PATH:
+        cache = _response_cache or await asyncio.to_thread(get_response_cache)
+    if cache is not None:
+        cached = cache.get_memory(request_key)
+        if cached is None:
+            cached = await asyncio.to_thread(cache.get, request_key)
+        if cached is not None:
+            span.count("cache_hits")
+            if on_token is not None:
+                on_token(cached)
+            if verbose:
+                print(f"--- Cached response from {model} ---")
+                print(cached)
+                print("-" * 25 + "\n")
+            return cached
+
+    messages = [
+        ChatCompletionSystemMessageParam(role="system", content=system),
+        ChatCompletionUserMessageParam(role="user", content=prompt)
+    ]
+
+    prompt_chars = len(system) + len(prompt)
+    span.set(prompt_chars=prompt_chars, stream=stream)
+    executed = False
+
+    async def _call() -> str:
+        nonlocal executed
+        executed = True
+        if stream:
+            emitted = []
+
+            def _on_token(delta: str) -> None:
+                emitted.append(len(delta))
+                if on_token is not None:
+                    on_token(delta)
+
+            content, usage = await scheduler.run(
+                model,
+                lambda: _stream_completion(model, messages, extra_params, _on_token),
+                prompt_chars, max_tokens,
+                # once tokens reached the caller a retry would repeat them
+                can_retry=lambda e: not emitted and is_retryable(e),
+                usage_of=lambda result: result[1],
+            )
+        else:
+            completion = await scheduler.run(
+                model,
+                lambda: get_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **extra_params,
+                ),
+                prompt_chars, max_tokens,
+            )
+            content, usage = completion.choices[0].message.content, completion.usage
+
+        if usage is not None:
+            span.count("prompt_tokens", usage.prompt_tokens or 0)
+            span.count("completion_tokens", usage.completion_tokens or 0)
 
         if track:
+            # streams may end without a usage chunk; the call is still counted
             try:
-                await save_num_tokens(model, completion.usage.prompt_tokens, completion.usage.completion_tokens)
+                await save_num_tokens(model, getattr(usage, "prompt_tokens", None),
+                                      getattr(usage, "completion_tokens", None))
             except Exception as e:
                 print(f"--- An error occurred while saving token {model} --- \n {e}")
 
             try:
-                await save_llm_interactions(model, prompt, system, completion)
+                await save_llm_interactions(model, prompt, system, content)
             except Exception as e:
                 print(f"--- An error occurred while saving interactions {model} --- \n {e}")
 
+        if cache is not None and content:
+            await asyncio.to_thread(cache.put, request_key, content, model)
+        return content
+
+    try:
+        if stream:
+            content = await _call()
+        else:
+            # Identical requests already in flight share that call (and its cost).
+            content = await in_flight.do(request_key, _call)
+            if not executed:
+                span.count("coalesced")
+            if on_token is not None and content:
+                on_token(content)
 
         if verbose:
             print(f"--- Response from {model} ---")
-            print(completion.choices[0].message.content)
+            print(content)
             print("-" * 25 + "\n")
 
-        return completion.choices[0].message.content
+        return content
     except Exception as e:
+        span.count("failures")
+        if raise_errors:
+            raise
         print(f"--- An error occurred for {model} ---")
         print(f"{e}\n")
         print("-" * 25 + "\n")
 
 
-async def save_num_tokens(model, input_token, output_token, save_at = 100):
-    time_stamp = int(time.time())
-    token_counter.append((model, input_token, output_token, time_stamp))
-    if len(token_counter) % save_at == 0:
-        file_name = str(run_id) + ".tokens"
-        with open(file_name, "w") as f:
-            f.write(str(token_counter))
-
-
-async def save_llm_interactions(model, prompt, system, completion):
-    file_name = './llm_logs/' + str(run_id) + "_llm" + ".json"
-    with open(file_name, "a") as f:
-        interaction = {
-            "model": model,
-            "prompt": prompt,
-            "system": system,
-            "messages": completion.choices[0].message.content,
-            "timestamp": time.time(),
-        }
-        f.write(json.dumps(interaction))
+async def save_num_tokens(model, input_token, output_token):
+    totals = token_totals.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    totals["calls"] += 1
+    totals["prompt_tokens"] += input_token or 0
+    totals["completion_tokens"] += output_token or 0
+    get_telemetry_writer("tokens").write({
+        "model": model,
+        "prompt_tokens": input_token,
+        "completion_tokens": output_token,
+        "timestamp": int(time.time()),
+    })
+
+
+async def save_llm_interactions(model, prompt, system, content):
+    get_telemetry_writer("llm").write({
+        "model": model,
+        "prompt": prompt,
+        "system": system,
+        "messages": content,
+        "timestamp": time.time(),
+    })
 
 
 # 5. Create a main async function to run our concurrent tasks
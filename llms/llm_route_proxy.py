@@ -1,19 +1,97 @@
 # proxy.py
-from fastapi import FastAPI, Request
-from starlette.responses import Response
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
 import httpx
+from fastapi import FastAPI, Request
+from starlette.background import BackgroundTask
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+
+from llms.single_flight import SingleFlight
+from llms.tracing import Span, NoopSpan, tracer
+
+TARGET = os.environ.get("LLM_ROUTER_URL", "http://prod0-intuitionx-llm-router-v2.sprinklr.com")
+
+# Upstream connection pool settings, overridable from the environment.
+MAX_CONNECTIONS = int(os.environ.get("PROXY_MAX_CONNECTIONS", "200"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("PROXY_MAX_KEEPALIVE_CONNECTIONS", "50"))
+KEEPALIVE_EXPIRY = float(os.environ.get("PROXY_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.environ.get("PROXY_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("PROXY_READ_TIMEOUT", "300"))
+HTTP2 = os.environ.get("PROXY_HTTP2", "0").lower() in ("1", "true", "yes")
+
+
+def create_upstream_client() -> httpx.AsyncClient:
+    """
+    Build the long-lived client shared by every forwarded request, so requests
+    reuse pooled keep-alive connections instead of paying TCP/TLS setup each time.
+    """
+    http2 = HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        except ImportError:
+            print("--- PROXY_HTTP2 is set but the 'h2' package is missing; falling back to HTTP/1.1 ---")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+    )
 
-TARGET = "http://prod0-intuitionx-llm-router-v2.sprinklr.com"
-app = FastAPI()
 
-import json
-import httpx
-from fastapi import Request, Response # Assuming you are using FastAPI
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.client = create_upstream_client()
+    try:
+        yield
+    finally:
+        await app.state.client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Identical non-streamed requests that overlap in time share one upstream call.
+in_flight = SingleFlight()
+
+# Hop-by-hop / framing headers that must not be copied from the upstream response.
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "content-length",
+}
+
+
+def response_headers(resp: httpx.Response, decoded: bool) -> dict:
+    """
+    Headers to send back to the client. When the body was decoded by httpx
+    (`resp.content`), the upstream content-encoding no longer applies.
+    """
+    skip = HOP_BY_HOP_HEADERS | ({"content-encoding"} if decoded else set())
+    return {k: v for k, v in resp.headers.items() if k.lower() not in skip}
+
+
+def _is_deterministic(params: dict) -> bool:
+    try:
+        return float(params.get("temperature") or 0) <= 0 and int(params.get("n") or 1) <= 1
+    except (TypeError, ValueError):
+        return False
 
-# Assume TARGET is defined elsewhere, for example:
-# TARGET = "http://your-target-service.com"
 
-async def forward(path: str, request: Request):
+async def forward(path: str, request: Request, streamable: bool = False):
+    with tracer.span("proxy_forward", route=path) as span:
+        response = await _forward(span, path, request, streamable)
+        span.label(status=response.status_code)
+        return response
+
+
+async def _forward(span: Span | NoopSpan, path: str, request: Request, streamable: bool):
     default_body_params = {
         "client_identifier": "ml-ca-dev",
         "temperature": 0,
@@ -29,6 +107,7 @@ async def forward(path: str, request: Request):
 
     # 2. Parse the body string into a dictionary and merge with defaults
     final_body_params = default_body_params.copy()
+    coalescable = True
     if body_str:
         try:
             incoming_params = json.loads(body_str)
@@ -37,7 +116,13 @@ async def forward(path: str, request: Request):
             # Handle cases where the body is not valid JSON, if necessary.
             # For now, we'll proceed with only the default params.
             # You could also return a 400 Bad Request error here.
-            pass
+            # Distinct invalid bodies would all look like the defaults, so never share them.
+            coalescable = False
+
+    # Sampled (temperature > 0) or multi-choice (n > 1) requests are expected to
+    # differ from call to call; sharing one response would change the results.
+    if not _is_deterministic(final_body_params):
+        coalescable = False
 
     # 3. Convert the merged dictionary back to a JSON string for the request
     #    This is the new body that will be forwarded.
@@ -50,31 +135,81 @@ async def forward(path: str, request: Request):
 
     url = f"{TARGET}{path}"
 
-    async with httpx.AsyncClient() as client:
-        # 4. Use the 'updated_body_content' in the outgoing request
-        resp = await client.request(
+    # 4. Use the 'updated_body_content' in the outgoing request, over the pooled client
+    client: httpx.AsyncClient = request.app.state.client
+    upstream_request = client.build_request(
+        request.method,
+        url,
+        content=updated_body_content,
+        headers=headers,
+        params=request.query_params
+    )
+
+    # 5. Streamed completions (SSE) are relayed chunk by chunk as they arrive,
+    #    instead of being buffered until the generation finishes.
+    span.set(model=final_body_params.get("model"), body_bytes=len(body_bytes))
+    if streamable and final_body_params.get("stream"):
+        # only the time to the response headers; the body streams after the span ends
+        sent = time.perf_counter()
+        resp = await client.send(upstream_request, stream=True)
+        span.time("upstream", time.perf_counter() - sent)
+        return StreamingResponse(
+            resp.aiter_raw(),
+            status_code=resp.status_code,
+            headers=response_headers(resp, decoded=False),
+            background=BackgroundTask(resp.aclose)
+        )
+
+    executed = False
+
+    async def _send() -> tuple[int, dict, bytes]:
+        nonlocal executed
+        executed = True
+        sent = time.perf_counter()
+        resp = await client.send(upstream_request)
+        span.time("upstream", time.perf_counter() - sent)
+        return resp.status_code, response_headers(resp, decoded=True), resp.content
+
+    if coalescable:
+        # Key on the canonicalised merged body, plus the caller's credentials so
+        # responses are never shared across API keys.
+        key = (
             request.method,
-            url,
-            content=updated_body_content,
-            headers=headers,
-            params=request.query_params
+            path,
+            str(request.query_params),
+            request.headers.get("authorization"),
+            json.dumps(final_body_params, sort_keys=True, separators=(",", ":")),
         )
+        status_code, resp_headers, content = await in_flight.do(key, _send)
+        if not executed:
+            span.count("coalesced")
+    else:
+        status_code, resp_headers, content = await _send()
 
     return Response(
-        content=resp.content,
-        status_code=resp.status_code,
-        headers=resp.headers
+        content=content,
+        status_code=status_code,
+        headers=resp_headers
     )
+
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition of the proxy's span metrics (LLM_TRACING=1)
+    return PlainTextResponse(tracer.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/v1/chat/completions")
 async def chat_completions(request: Request):
     # rewrite to /chat-completion
-    return await forward("/chat-completion", request)
+    return await forward("/chat-completion", request, streamable=True)
 
 
 @app.post("/chat/completions")
-async def chat_completions(request: Request):
-    # rewrite to /chat-completion
-    return await forward("/chat-completion", request)
+async def chat_completions_unversioned(request: Request):
+    # rewrite to /chat-completion; client_app's base_url has no /v1, so this
+    # is the route ask_model_plus(stream=True) goes through
+    return await forward("/chat-completion", request, streamable=True)
 
 @app.get("/v1/models")
 async def models(request: Request):
@@ -84,7 +219,7 @@ async def models(request: Request):
 @app.post("/v1/completions")
 async def completions(request: Request):
     # rewrite to /completion
-    return await forward("/completion", request)
+    return await forward("/completion", request, streamable=True)
 
 # add any other routes you need...
 
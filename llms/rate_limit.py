@@ -0,0 +1,295 @@
+import asyncio
+import email.utils
+import logging
+import math
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, TypeVar
+
+import openai
+
+from llms.tracing import tracer
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Default per-model limits; override with `RequestScheduler.configure`. None means
+# no client-side cap: an unconfigured model runs unthrottled until its first
+# 429/5xx, after which the AIMD concurrency limit takes over.
+DEFAULT_LIMITS = {
+    "rpm": None,                # requests per minute
+    "tpm": None,                # prompt + completion tokens per minute
+    "max_concurrency": None,    # upper bound for the adaptive concurrency limit
+    "min_concurrency": 1,
+}
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `rate_per_minute`.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` can be taken (0 if available now).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float) -> None:
+        """
+        Return (or, with a negative amount, charge) tokens after the real cost is known.
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelLimiter:
+    """
+    Client-side limits for one model: request and token buckets (only when
+    `rpm`/`tpm` are set), plus an AIMD concurrency limit that halves on 429/5xx
+    responses and grows back by about one slot per window of successful calls.
+    Without `max_concurrency` the limit starts unbounded and is first set to
+    half the calls in flight when the server pushes back.
+    """
+
+    def __init__(self, rpm: float | None = None, tpm: float | None = None,
+                 max_concurrency: int | None = None, min_concurrency: int = 1):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency or math.inf
+        self.min_concurrency = min_concurrency
+        # start optimistic and let 429/5xx responses pull the limit down
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Condition()
+        self._last_decrease = 0.0
+
+        # running estimates used to price a request before it is sent
+        self.tokens_per_char = 0.25
+        self.completion_tokens = 150.0
+
+        self.successes = 0
+        self.throttled = 0
+        self.server_errors = 0
+
+    def estimate_tokens(self, prompt_chars: int, max_tokens: int | None = None) -> float:
+        completion = min(max_tokens, self.completion_tokens) if max_tokens else self.completion_tokens
+        return prompt_chars * self.tokens_per_char + completion
+
+    def observe_usage(self, prompt_chars: int, estimated: float, usage) -> None:
+        """
+        Refine the estimates with the usage a response reported and settle the
+        token bucket with the difference between estimated and real cost.
+        """
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        if prompt_chars and prompt_tokens:
+            self.tokens_per_char = 0.9 * self.tokens_per_char + 0.1 * (prompt_tokens / prompt_chars)
+        self.completion_tokens = 0.9 * self.completion_tokens + 0.1 * completion_tokens
+        if self.tokens is not None:
+            self.tokens.give(estimated - (prompt_tokens + completion_tokens))
+
+    def _has_room(self) -> bool:
+        return self.limit == math.inf or self.in_flight < int(self.limit)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: float):
+        """
+        Wait for a concurrency slot and for request/token budget, then hold the slot.
+        """
+        async with self._changed:
+            await self._changed.wait_for(self._has_room)
+            self.in_flight += 1
+        try:
+            while True:
+                delay = max(self.requests.wait_time(1) if self.requests is not None else 0.0,
+                            self.tokens.wait_time(estimated_tokens) if self.tokens is not None else 0.0)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(estimated_tokens)
+            yield
+        finally:
+            async with self._changed:
+                self.in_flight -= 1
+                self._changed.notify_all()
+
+    async def on_success(self) -> None:
+        self.successes += 1
+        if self.limit == math.inf:
+            return
+        async with self._changed:
+            # additive increase: roughly +1 slot per `limit` successful calls
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._changed.notify_all()
+
+    async def on_overload(self, status: int | None) -> None:
+        if status == 429:
+            self.throttled += 1
+        else:
+            self.server_errors += 1
+        now = time.monotonic()
+        # multiplicative decrease, at most once per second so a burst of failures
+        # from the same window does not collapse the limit to the floor
+        if now - self._last_decrease >= 1.0:
+            self._last_decrease = now
+            # the first push-back sizes the limit from the load that caused it
+            # (the failed call has already left `in_flight`)
+            current = self.in_flight + 1 if self.limit == math.inf else self.limit
+            self.limit = max(self.min_concurrency, current / 2)
+
+
+def status_of(exc: BaseException) -> int | None:
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Throttling, server errors, timeouts and connection failures are worth retrying.
+    """
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    status = status_of(exc)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """
+    The server's requested back-off from Retry-After / retry-after-ms, if any.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Per-model rate limiting, cost-aware admission and jittered retries for LLM calls.
+
+    Every call waits for a slot from its model's limiter (concurrency, requests
+    per minute and estimated tokens per minute), and retryable failures are
+    retried with full-jitter exponential back-off, never sooner than the
+    server's Retry-After.
+    """
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limits: dict[str, dict] = {}
+        self.limiters: dict[str, ModelLimiter] = {}
+        self.retries = 0
+        self.failures = 0
+
+    def configure(self, model: str, **limits) -> None:
+        """
+        Set limits for `model` (rpm, tpm, max_concurrency, min_concurrency).
+        Takes effect for limiters created afterwards.
+        """
+        self.limits[model] = {**self.limits.get(model, {}), **limits}
+        self.limiters.pop(model, None)
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self.limiters.get(model)
+        # limiters hold asyncio primitives, so they cannot outlive their event loop
+        if limiter is None or limiter.loop is not asyncio.get_running_loop():
+            limiter = ModelLimiter(**{**DEFAULT_LIMITS, **self.limits.get(model, {})})
+            self.limiters[model] = limiter
+        return limiter
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = retry_after_seconds(exc)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    async def run(
+        self,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        prompt_chars: int = 0,
+        max_tokens: int | None = None,
+        can_retry: Callable[[BaseException], bool] = is_retryable,
+        usage_of: Callable[[T], object] = lambda result: getattr(result, "usage", None),
+    ) -> T:
+        """
+        Call `fn()` under `model`'s limits, retrying failures that `can_retry`
+        accepts. `usage_of` extracts the usage object from the result so the
+        token estimate and budget can be corrected.
+        """
+        limiter = self.limiter(model)
+        span = tracer.current()
+        attempt = 0
+        while True:
+            estimated = limiter.estimate_tokens(prompt_chars, max_tokens)
+            queued = time.perf_counter()
+            try:
+                async with limiter.slot(estimated):
+                    sent = time.perf_counter()
+                    span.time("queue_wait", sent - queued)
+                    try:
+                        result = await fn()
+                    finally:
+                        span.time("upstream", time.perf_counter() - sent)
+            except Exception as e:
+                status = status_of(e)
+                if status == 429 or (status is not None and status >= 500):
+                    await limiter.on_overload(status)
+                if attempt >= self.max_retries or not can_retry(e):
+                    self.failures += 1
+                    raise
+                delay = self.backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                span.count("retries")
+                logger.info("Retrying %s in %.1fs (attempt %d/%d): %s", model, delay, attempt, self.max_retries, e)
+                await asyncio.sleep(delay)
+                continue
+            await limiter.on_success()
+            limiter.observe_usage(prompt_chars, estimated, usage_of(result))
+            return result
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM responses.
+
+    Entries are keyed on a SHA-256 of (model, system prompt, user prompt, extra
+    request params) and persisted in a single SQLite file, with an in-memory LRU
+    in front of it. The on-disk store is bounded by entry count and by age:
+    entries older than `max_age_seconds` are dropped, and when there are more
+    than `max_entries` the least recently used ones go first.
+
+    `get` and `put` touch the SQLite file; from async code run them with
+    `asyncio.to_thread`. `get_memory` only looks at the in-memory LRU and is
+    safe to call on the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 200_000,
+        max_age_seconds: float | None = 30 * 24 * 3600,
+        memory_entries: int = 4096,
+        evict_every: int = 1000,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.memory_entries = memory_entries
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (response, created_at)
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._puts_since_evict = 0
+        # _lock guards the in-memory LRU only, so get_memory never waits on disk
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self.evict()
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str, **params) -> str:
+        """
+        Hash a request into its cache key. `params` holds any extra request
+        parameters that change the answer (e.g. max_tokens).
+        """
+        payload = json.dumps(
+            {"model": model, "system": system, "prompt": prompt, "params": params},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_memory(self, key: str) -> str | None:
+        """
+        Return the response for `key` if it is in the in-memory LRU; counts
+        only hits, since a miss here may still be found on disk by `get`.
+        """
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is None or self._expired(cached[1], time.time()):
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+    def get(self, key: str) -> str | None:
+        """
+        Return the cached response for `key`, or None on a miss or an expired entry.
+        """
+        cached = self.get_memory(key)
+        if cached is not None:
+            return cached
+
+        now = time.time()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[1], now):
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None or self._expired(row[1], now):
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, model: str | None = None) -> None:
+        """
+        Store a response, evicting old entries every `evict_every` writes.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self._puts_since_evict += 1
+            if self._puts_since_evict < self.evict_every:
+                return
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries and trim the store to `max_entries`. Returns the number removed.
+        """
+        with self._db_lock:
+            self._puts_since_evict = 0
+            removed = 0
+            if self.max_age_seconds is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (time.time() - self.max_age_seconds,)
+                )
+                removed += cursor.rowcount
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                removed += cursor.rowcount
+        if removed:
+            with self._lock:
+                self._memory.clear()
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._db_lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+if __name__ == "__main__":
+    cache = ResponseCache("./llm_cache_example.sqlite", max_entries=2)
+    key = ResponseCache.make_key("gpt-4o-mini", "You are an assistant", "Say hi")
+    print("miss:", cache.get(key))
+    cache.put(key, "hi", model="gpt-4o-mini")
+    print("hit:", cache.get(key))
+    print(f"hits={cache.hits} misses={cache.misses} entries={len(cache)}")
+    cache.close()
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+
+    The first caller for a key starts `fn()` as a task; callers that arrive while
+    it is still running await the same task instead of starting their own, and
+    all of them receive its result (or its exception). Once the task finishes the
+    key is released, so later calls run afresh. A caller being cancelled does not
+    cancel the shared task for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,174 @@
+# stub_server.py
+# A minimal OpenAI-compatible upstream for local benchmarking, so the proxy and
+# the taggers can be exercised without the real router.
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+# Median upstream latency; with STUB_LATENCY_SIGMA > 0 latencies are log-normal
+# around it (sigma of the underlying normal), which gives a realistic long tail.
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "50"))
+LATENCY_SIGMA = float(os.environ.get("STUB_LATENCY_SIGMA", "0"))
+# Delay between streamed chunks when a request asks for stream: true.
+CHUNK_DELAY_MS = float(os.environ.get("STUB_CHUNK_DELAY_MS", "5"))
+# Share of requests answered with 429 (with Retry-After) or 500.
+RATE_LIMIT_RATE = float(os.environ.get("STUB_429_RATE", "0"))
+ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", "0"))
+RETRY_AFTER_S = os.environ.get("STUB_RETRY_AFTER_S", "0.1")
+# Fixed answer; when unset, answers are derived from the categories in the prompt.
+CANNED_CONTENT = os.environ.get("STUB_CONTENT")
+SEED = os.environ.get("STUB_SEED")
+
+app = FastAPI()
+rng = random.Random(int(SEED) if SEED is not None else None)
+
+
+def sample_latency() -> float:
+    """
+    Seconds to wait before answering.
+    """
+    if LATENCY_SIGMA > 0:
+        return LATENCY_MS * rng.lognormvariate(0, LATENCY_SIGMA) / 1000
+    return LATENCY_MS / 1000
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CATEGORIES = re.compile(r"(?:Allowed categories|Candidate category paths)\.\n(.*)", re.DOTALL)
+_DOCUMENT = re.compile(r"Documents?:\n(.*?)\n\n\n", re.DOTALL)
+
+
+def _rank_options(document: str, options: list[str]) -> list[str]:
+    """
+    Options ordered by word overlap with the document (ties keep prompt order),
+    so the stub's choices are deterministic and loosely plausible.
+    """
+    words = set(_WORD.findall(document.lower()))
+    scored = [(-len(words & set(_WORD.findall(option.lower()))), i, option) for i, option in enumerate(options)]
+    return [option for _, _, option in sorted(scored)]
+
+
+def derive_answer(system: str, prompt: str) -> str:
+    """
+    Answer in the JSON shape the system prompt asks for, choosing among the
+    options listed in the prompt: candidates (n_level_tagging), a single label
+    (n_level_tagging_simple), paths (flat_tagging) or a per-document list
+    (level_batched_tagging).
+    """
+    categories = _CATEGORIES.search(prompt)
+    lines = [line for line in (categories.group(1) if categories else "").splitlines() if line.strip()]
+    options = [line.split(" : ", 1)[0].strip() for line in lines]
+    key = "path" if '"path"' in system else "label"
+
+    def answer(document: str) -> dict:
+        ranked = _rank_options(document, options)[:3]
+        if '"candidates"' not in system:
+            return {"rationale": "stub", "label": ranked[0] if ranked else "None"}
+        confidences = [0.6, 0.25, 0.15]
+        return {"candidates": [
+            {"rationale": "stub", "confidence": confidence, key: option}
+            for option, confidence in zip(ranked, confidences)
+        ]}
+
+    document = _DOCUMENT.search(prompt)
+    document = document.group(1) if document else prompt
+    if '"documents"' in system:
+        blocks = re.findall(r'<document id="([^"]+)">\n(.*?)\n</document>', document, re.DOTALL)
+        body = {"documents": [{"id": doc_id, **answer(text)} for doc_id, text in blocks]}
+    else:
+        body = answer(document)
+    return f"```json\n{json.dumps(body, indent=2)}\n```"
+
+
+def completion_body(model: str, content: str, prompt_tokens: int = 0) -> dict:
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+async def stream_chunks(model: str, content: str, prompt_tokens: int = 0, chunk_chars: int = 8):
+    """
+    Yield `content` as OpenAI-style SSE chat.completion.chunk events.
+    """
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    def event(choices: list, usage: dict | None = None) -> str:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                 "created": int(time.time()), "model": model, "choices": choices}
+        if usage is not None:
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    for start in range(0, len(content), chunk_chars):
+        delta = {"content": content[start:start + chunk_chars]}
+        if start == 0:
+            delta["role"] = "assistant"
+        yield event([{"index": 0, "delta": delta, "finish_reason": None}])
+        await asyncio.sleep(CHUNK_DELAY_MS / 1000)
+    yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+    usage = completion_body(model, content, prompt_tokens)["usage"]
+    yield event([], usage)
+    yield "data: [DONE]\n\n"
+
+
+async def _chat(request: Request):
+    body = await request.json()
+    await asyncio.sleep(sample_latency())
+    roll = rng.random()
+    if roll < RATE_LIMIT_RATE:
+        return JSONResponse({"error": {"message": "stub rate limit", "type": "rate_limit_error"}},
+                            status_code=429, headers={"retry-after": RETRY_AFTER_S})
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        return JSONResponse({"error": {"message": "stub server error", "type": "server_error"}}, status_code=500)
+
+    messages = body.get("messages", [])
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+    model = body.get("model", "stub")
+    if CANNED_CONTENT is not None:
+        content = CANNED_CONTENT
+    else:
+        system = next((str(m.get("content", "")) for m in messages if m.get("role") == "system"), "")
+        prompt = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+        content = derive_answer(system, prompt)
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(model, content, prompt_chars // 4),
+                                 media_type="text/event-stream")
+    return completion_body(model, content, prompt_chars // 4)
+
+
+# Router-style paths (what llm_route_proxy forwards to) and OpenAI-style paths.
+app.post("/chat-completion")(_chat)
+app.post("/completion")(_chat)
+app.post("/v1/chat/completions")(_chat)
+app.post("/chat/completions")(_chat)
+
+
+@app.get("/models")
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.environ.get("STUB_PORT", "4100")))
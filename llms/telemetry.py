@@ -0,0 +1,113 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class TelemetryWriter:
+    """
+    Append-only JSONL writer that keeps file I/O off the caller's thread.
+
+    `write` only enqueues the record (it never blocks: when the bounded queue is
+    full the record is dropped and counted in `dropped`). A background thread
+    drains the queue in batches, flushing at least every `flush_interval`
+    seconds, and rolls over to a new part file once the current one exceeds
+    `max_bytes`. Files are named `<prefix>.<part>.jsonl` (`.jsonl.gz` with
+    compress=True). Pending records are flushed by `close()`, which is also
+    registered to run at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        max_queue: int = 10_000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        compress: bool = False,
+    ):
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.written = 0
+        self.dropped = 0
+        self.part = 0
+
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while os.path.exists(self.path):
+            # never append to a previous run's parts
+            self.part += 1
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"telemetry:{prefix}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def path(self) -> str:
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        return f"{self.prefix}.{self.part:04d}{suffix}"
+
+    def write(self, record: dict) -> bool:
+        """
+        Queue a record for writing. Returns False if it was dropped.
+        """
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """
+        Flush everything queued so far and stop the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: list[dict]) -> None:
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch).encode("utf-8")
+        try:
+            opener = gzip.open if self.compress else open
+            with opener(self.path, "ab") as f:
+                f.write(data)
+            self.written += len(batch)
+            if os.path.getsize(self.path) >= self.max_bytes:
+                self.part += 1
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"--- Telemetry write to {self.path} failed --- \n {e}")
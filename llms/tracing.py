@@ -0,0 +1,247 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+import uuid
+
+from llms.telemetry import TelemetryWriter
+
+# Latency buckets (seconds) for every histogram.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms keyed by name and label set, rendered
+    in the Prometheus text format by `render`.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 2)
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": {self._render_key(k): v for k, v in self.counters.items()},
+                "histograms": {self._render_key(k): {"sum": h[-2], "count": h[-1]} for k, h in self.histograms.items()},
+            }
+
+    @staticmethod
+    def _escape(value) -> str:
+        # label values in the text format escape backslash, double quote and newline
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _render_labels(cls, labels: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{cls._escape(v)}"' for k, v in labels] + ([extra] if extra else [])
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _render_key(self, key: tuple) -> str:
+        return key[0] + self._render_labels(key[1])
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self._render_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), histogram[:-2]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = self._render_labels(labels, 'le="%s"' % le)
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{self._render_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_count{self._render_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+class Span:
+    """
+    One timed operation. Labels (low-cardinality: model, level, route, ...)
+    are inherited by child spans and attached to metrics; attributes, counts
+    and timings go to the trace record. On exit the span's duration and
+    timings feed histograms and its counts feed counters, all named
+    `<span>_<key>`.
+    """
+
+    __slots__ = ("tracer", "name", "labels", "attrs", "counts", "timings",
+                 "parent", "span_id", "trace_id", "start", "_token")
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: 'Span | None', labels: dict):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.labels = {**parent.labels, **labels} if parent is not None else labels
+        self.attrs: dict = {}
+        self.counts: dict[str, float] = {}
+        self.timings: dict[str, float] = {}
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.start = 0.0
+        self._token = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def label(self, **labels) -> None:
+        self.labels.update(labels)
+
+    def count(self, key: str, value: float = 1) -> None:
+        self.counts[key] = self.counts.get(key, 0) + value
+
+    def time(self, key: str, seconds: float) -> None:
+        self.timings[key] = self.timings.get(key, 0.0) + seconds
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter() - self.start
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish(self, duration)
+
+
+class NoopSpan:
+    """
+    Returned while tracing is disabled; every method does nothing.
+    """
+
+    __slots__ = ()
+    labels: dict = {}
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def label(self, **labels) -> None:
+        pass
+
+    def count(self, key: str, value: float = 1) -> None:
+        pass
+
+    def time(self, key: str, seconds: float) -> None:
+        pass
+
+    def __enter__(self) -> 'NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans and exports finished ones to a `MetricsRegistry` and,
+    optionally, a JSONL trace file (through a background `TelemetryWriter`).
+
+    Disabled by default; `span()` then returns a shared no-op object, so the
+    instrumented code pays one attribute check per span.
+    """
+
+    def __init__(self, enabled: bool = False, trace_path: str | None = None):
+        self.registry = MetricsRegistry()
+        self.enabled = False
+        self.writer: TelemetryWriter | None = None
+        self.configure(enabled, trace_path)
+
+    def configure(self, enabled: bool = True, trace_path: str | None = None) -> None:
+        """
+        Turn tracing on or off; with `trace_path`, also write spans to
+        `<trace_path>.<part>.jsonl`.
+        """
+        self.enabled = enabled
+        if self.writer is not None and trace_path != self.writer.prefix:
+            self.writer.close()
+            self.writer = None
+        if enabled and trace_path and self.writer is None:
+            self.writer = TelemetryWriter(trace_path)
+
+    def span(self, name: str, **labels) -> Span | NoopSpan:
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current.get(), labels)
+
+    def current(self) -> Span | NoopSpan:
+        """
+        The innermost open span of this task, for adding counts/timings from
+        code that does not own it.
+        """
+        span = _current.get() if self.enabled else None
+        return span if span is not None else NOOP_SPAN
+
+    def _finish(self, span: Span, duration: float) -> None:
+        registry = self.registry
+        registry.observe(f"{span.name}_seconds", duration, **span.labels)
+        for key, seconds in span.timings.items():
+            registry.observe(f"{span.name}_{key}_seconds", seconds, **span.labels)
+        for key, value in span.counts.items():
+            registry.inc(f"{span.name}_{key}_total", value, **span.labels)
+        if "error" in span.attrs:
+            registry.inc(f"{span.name}_errors_total", **span.labels)
+        if self.writer is not None:
+            self.writer.write({
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent.span_id if span.parent is not None else None,
+                "name": span.name,
+                "start": span.start,
+                "duration": duration,
+                "labels": span.labels,
+                "attrs": span.attrs,
+                "counts": span.counts,
+                "timings": span.timings,
+            })
+
+
+# Process-wide tracer, configured from the environment:
+#   LLM_TRACING=1            enable spans and metrics
+#   LLM_TRACE_FILE=<prefix>  also write spans to <prefix>.<part>.jsonl
+tracer = Tracer(
+    enabled=os.environ.get("LLM_TRACING", "0").lower() in ("1", "true", "yes"),
+    trace_path=os.environ.get("LLM_TRACE_FILE") or None,
+)
@@ -0,0 +1,239 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+from typing import IO, Iterable, Iterator
+
+
+def normalize_soft_targets(candidates: list[dict]) -> list[dict]:
+    """
+    Given a list of candidate dicts with 'label' and 'confidence', return the
+    same candidates with confidences rescaled to sum to 1 (uniform if they are
+    all zero or missing).
+    """
+    if not candidates:
+        return []
+    confidences = []
+    for c in candidates:
+        try:
+            confidences.append(max(float(c.get('confidence') or 0), 0.0))
+        except (TypeError, ValueError):
+            confidences.append(0.0)
+    total = sum(confidences)
+    return [
+        {
+            "label": c['label'],
+            "confidence": confidence / total if total > 0 else 1.0 / len(candidates),
+            "rationale": c.get('rationale')
+        } for c, confidence in zip(candidates, confidences)
+    ]
+
+
+def build_input(title: str, abstract: str, parent_path: list[str]) -> str:
+    """
+    Construct the model input string from title, abstract, and previous labels path.
+    """
+    parts = [f"TITLE: {title}", f"ABSTRACT: {abstract}"]
+    if parent_path:
+        chain = ' > '.join(parent_path)
+        parts.append(f"PREVIOUS_LABELS: {chain}")
+    return "\n".join(parts)
+
+
+def flatten_example(record: dict) -> Iterator[dict]:
+    """
+    Yield one training row per level of a tagged record ({"example", "response"}
+    as produced by `tag_batch`): paper_id, level, input, label, rationale,
+    soft_targets and parent_path.
+
+    Results from `n_level_tagging_simple` carry no candidates; their soft
+    target is the prediction itself with confidence 1.
+    """
+    example = record.get('example') or {}
+    title = example.get('title', '')
+    abstract = example.get('abstract', '')
+    response = record.get('response')
+    parent_path: list[str] = []
+    level = 1
+    while isinstance(response, dict) and response.get('prediction') is not None:
+        label = response['prediction']
+        candidates = [c for c in response.get('candidates') or [] if isinstance(c, dict) and c.get('label')]
+        if not candidates:
+            candidates = [{"label": label, "confidence": 1.0, "rationale": response.get('rationale')}]
+        yield {
+            'paper_id': example.get('id', record.get('id')),
+            'level': level,
+            'input': build_input(title, abstract, parent_path),
+            'label': label,
+            'rationale': response.get('rationale'),
+            'soft_targets': normalize_soft_targets(candidates),
+            'parent_path': list(parent_path)
+        }
+        parent_path.append(label)
+        level += 1
+        response = response.get('children')
+
+
+def flatten_records(records: Iterable[dict]) -> Iterator[dict]:
+    """
+    Lazily flatten nested records into per-level rows.
+    """
+    for record in records:
+        yield from flatten_example(record)
+
+
+def _open(path: str, mode: str) -> IO:
+    # csv needs newline='' so that quoted fields may contain line breaks
+    newline = '' if path.endswith(('.csv', '.csv.gz')) else None
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline=newline)
+    return open(path, mode, encoding='utf-8', newline=newline)
+
+
+def _iter_json_array(f: IO, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """
+    Stream the elements of a top-level JSON array without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    while True:
+        chunk = f.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started:
+                if pos >= len(buffer):
+                    break
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array of records")
+                started, pos = True, pos + 1
+                continue
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break  # the element continues in the next chunk
+            yield item
+            pos = end
+        if not chunk:
+            return
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """
+    Read tagged records one at a time from JSONL (optionally .gz) or, for files
+    written by older runs, from a JSON array.
+    """
+    with _open(path, 'r') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if first == '[':
+            f.seek(0)
+            yield from _iter_json_array(f)
+            return
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield json.loads(line)
+            line = f.readline()
+
+
+class ShardedJsonlWriter:
+    """
+    Write rows to `<prefix>-<shard:05d>.jsonl[.gz]`, starting a new shard every
+    `shard_size` rows. Only the current shard is open at any time.
+    """
+
+    def __init__(self, prefix: str, shard_size: int = 100_000, compress: bool = False):
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.compress = compress
+        self.paths: list[str] = []
+        self.rows = 0
+        self._file: IO | None = None
+        self._in_shard = 0
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, row: dict) -> None:
+        if self._file is None or self._in_shard >= self.shard_size:
+            self._roll()
+        self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._in_shard += 1
+        self.rows += 1
+
+    def _roll(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        suffix = '.jsonl.gz' if self.compress else '.jsonl'
+        path = f"{self.prefix}-{len(self.paths):05d}{suffix}"
+        self.paths.append(path)
+        self._file = _open(path, 'w')
+        self._in_shard = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'ShardedJsonlWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def shard_paths(prefix: str) -> list[str]:
+    """
+    The shards written for `prefix`, in order.
+    """
+    return sorted(glob.glob(f"{glob.escape(prefix)}-[0-9][0-9][0-9][0-9][0-9].jsonl*"))
+
+
+def iter_shards(prefix: str) -> Iterator[dict]:
+    for path in shard_paths(prefix):
+        yield from iter_records(path)
+
+
+def flatten_file(
+    input_path: str,
+    output_prefix: str | None = None,
+    shard_size: int = 100_000,
+    compress: bool = False
+) -> list[str]:
+    """
+    Stream a tagged file through `flatten_records` into sharded JSONL.
+    The output prefix defaults to `<input without extension>_flat`.
+
+    Returns:
+        The shard paths written.
+    """
+    if output_prefix is None:
+        output_prefix = input_path.split('.json')[0] + '_flat'
+    for stale in shard_paths(output_prefix):
+        os.remove(stale)
+    with ShardedJsonlWriter(output_prefix, shard_size, compress) as writer:
+        for row in flatten_records(iter_records(input_path)):
+            writer.write(row)
+    print(f"Flattened {input_path} → {writer.rows} rows in {len(writer.paths)} shard(s) at {output_prefix}")
+    return writer.paths
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Flatten tagged records into per-level training rows")
+    p.add_argument("inputs", nargs="+", help="Tagged JSONL (or legacy JSON array) files.")
+    p.add_argument("--out_prefix", type=str, default=None, help="Output prefix (single input only).")
+    p.add_argument("--shard_size", type=int, default=100_000, help="Rows per output shard.")
+    p.add_argument("--compress", action="store_true", help="Write .jsonl.gz shards.")
+    args = p.parse_args()
+
+    for path in args.inputs:
+        flatten_file(path, args.out_prefix if len(args.inputs) == 1 else None, args.shard_size, args.compress)
@@ -0,0 +1,8 @@
+def dblp_format(example: dict) -> str:
+    """
+    Render a DBLP record (title + abstract) into the document text sent to the taggers.
+    """
+    return f"""
+    **{example['title']}**
+    {example['abstract']}
+    """
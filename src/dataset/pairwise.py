@@ -0,0 +1,91 @@
+import csv
+import re
+from typing import Iterable, Iterator
+
+# Levels annotated in pairwise_dataset*.csv (soft_labels_l1..l3, relevant_children_l1..l3, reasoning_l1..l3).
+LEVELS = (1, 2, 3)
+
+# "Label A:0.9,Label, with comma:0.1" -> [("Label A", 0.9), ("Label, with comma", 0.1)]
+_SOFT_LABEL = re.compile(r"\s*(.+?):(-?\d+(?:\.\d+)?)\s*(?:,|$)")
+
+
+def parse_soft_labels(text: str) -> list[tuple[str, float]]:
+    """
+    Parse a soft_labels_l* cell into (label, score) pairs, in file order.
+    Labels may themselves contain commas (ACM CCS has several).
+    """
+    return [(label, float(score)) for label, score in _SOFT_LABEL.findall(text or "")]
+
+
+def parse_label_list(text: str, known_labels: Iterable[str] | None = None) -> list[str]:
+    """
+    Parse a comma-separated relevant_children_l* cell. When `known_labels` is
+    given, comma-split pieces are re-joined until they form a known label, so
+    labels such as "Extraction, transformation and loading" survive.
+    """
+    known = set(known_labels) if known_labels is not None else None
+    labels, current = [], ""
+    for piece in (text or "").split(","):
+        current = f"{current},{piece}" if current else piece
+        if known is None or current.strip() in known:
+            if current.strip():
+                labels.append(current.strip())
+            current = ""
+    if current.strip():
+        labels.append(current.strip())
+    return labels
+
+
+def read_pairwise_csv(path: str, known_labels: Iterable[str] | None = None) -> Iterator[dict]:
+    """
+    Stream rows of a pairwise_dataset*.csv file with the label columns parsed:
+    each row gains "soft_labels" ({level: [(label, score)]}) and "relevant"
+    ({level: [label]}) next to the raw columns.
+    """
+    known = set(known_labels) if known_labels is not None else None
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row["soft_labels"] = {
+                level: parse_soft_labels(row.get(f"soft_labels_l{level}", "")) for level in LEVELS
+            }
+            row["relevant"] = {
+                level: parse_label_list(row.get(f"relevant_children_l{level}", ""), known) for level in LEVELS
+            }
+            yield row
+
+
+def gold_path(row: dict) -> list[str]:
+    """
+    The row's reference label per level: the first relevant child, or the
+    best-scored soft label when none is listed. Stops at the first level
+    without either.
+    """
+    path = []
+    for level in LEVELS:
+        relevant = row["relevant"].get(level) or []
+        soft = [(label, score) for label, score in row["soft_labels"].get(level) or [] if score > 0]
+        if relevant:
+            path.append(relevant[0])
+        elif soft:
+            path.append(max(soft, key=lambda pair: pair[1])[0])
+        else:
+            break
+    return path
+
+
+def ground_truth_rows(rows: Iterable[dict]) -> Iterator[dict]:
+    """
+    Per-level ground truth in the format of `src.tagging.evaluation`
+    ({paper_id, level, label, soft_targets, parent_path}) for parsed rows.
+    """
+    for row in rows:
+        path = gold_path(row)
+        for level, label in enumerate(path, start=1):
+            ranked = sorted(row["soft_labels"].get(level) or [], key=lambda pair: pair[1], reverse=True)
+            yield {
+                "paper_id": row.get("id"),
+                "level": level,
+                "label": label,
+                "soft_targets": [{"label": l, "confidence": score} for l, score in ranked if score > 0],
+                "parent_path": path[:level - 1],
+            }
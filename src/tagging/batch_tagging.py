@@ -0,0 +1,106 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+from src.dataset.formatting import dblp_format
+from src.taxonomy import Taxonomy
+from src.tagging.n_level_tagging import tag_n_level
+
+Tagger = Callable[..., Awaitable[dict]]
+
+
+async def tag_batch(
+    examples: Iterable[dict],
+    taxonomy: Taxonomy,
+    model: str = "local-qwen3:0.6b",
+    max_concurrency: int = 5,
+    max_pending_documents: int | None = None,
+    formatter: Callable[[dict], str] = dblp_format,
+    tagger: Tagger = tag_n_level,
+    id_field: str = "id",
+) -> AsyncIterator[dict]:
+    """
+    Tags many documents concurrently and yields results as soon as each one finishes.
+
+    Every LLM call of every document (and every level) goes through one shared
+    semaphore, so at most `max_concurrency` requests are in flight at any time.
+    Examples are pulled lazily from `examples`, so arbitrarily large iterables
+    can be streamed through without materialising all tasks up front.
+
+    Args:
+        examples: Iterable of records (e.g. DBLP rows with id, title, abstract).
+        taxonomy: The Taxonomy to tag against.
+        model: The LLM model identifier passed to the tagger.
+        max_concurrency: Maximum number of in-flight LLM calls across all documents.
+        max_pending_documents: Maximum number of documents being tagged at once.
+            Defaults to 4 x max_concurrency, which keeps the semaphore saturated
+            while documents wait between levels.
+        formatter: Turns an example into the document text.
+        tagger: Either `n_level_tagging.tag_n_level` or `n_level_tagging_simple.tag_n_level`.
+        id_field: Key holding the example id.
+
+    Yields:
+        Dicts of the form {"id", "example", "response"}; if tagging a document
+        raised, "response" is None and "error" holds the exception message.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    max_pending = max_pending_documents or 4 * max_concurrency
+
+    async def _run(example: dict) -> dict:
+        record = {"id": example.get(id_field), "example": example}
+        try:
+            record["response"] = await tagger(
+                formatter(example), taxonomy, model=model, semaphore=semaphore
+            )
+        except Exception as e:
+            record["response"] = None
+            record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    iterator = iter(examples)
+    pending: set[asyncio.Task] = set()
+
+    def _fill() -> None:
+        while len(pending) < max_pending:
+            example = next(iterator, None)
+            if example is None:
+                return
+            pending.add(asyncio.create_task(_run(example)))
+
+    try:
+        _fill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+            _fill()
+    finally:
+        # The consumer stopped early (break / exception): don't leak running calls.
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def tag_all(examples: Iterable[dict], taxonomy: Taxonomy, **kwargs) -> list[dict]:
+    """
+    Convenience wrapper around `tag_batch` that collects results, in completion order.
+    """
+    return [record async for record in tag_batch(examples, taxonomy, **kwargs)]
+
+
+if __name__ == "__main__":
+    # Example usage (requires the LiteLLM proxy on localhost:4000):
+    sample = [
+        {"id": 1, "title": "Attention Is All You Need",
+         "abstract": "We propose the Transformer, based solely on attention mechanisms."},
+    ]
+    taxonomy = Taxonomy()
+    taxonomy.add_node(['Computing methodologies'], 'Machine learning, AI and related methods')
+    taxonomy.add_node(['Security and privacy'], 'Cryptography and systems security')
+
+    async def main():
+        async for record in tag_batch(sample, taxonomy, max_concurrency=2):
+            print(record["id"], record["response"])
+
+    asyncio.run(main())
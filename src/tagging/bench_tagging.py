@@ -0,0 +1,177 @@
+# bench_tagging.py
+# End-to-end throughput benchmark for the taggers, fully offline: starts the stub
+# upstream (answers derived from the prompt's categories) and llm_route_proxy as
+# subprocesses, points client_app at the proxy and tags pairwise_dataset_test.csv.
+#
+#   python -m src.tagging.bench_tagging --tagger n_level --concurrency 16 --latency_ms 80 --latency_sigma 0.5
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from llms import client_app
+from llms.bench_proxy import percentile, start_server, wait_until_up
+from src.dataset.pairwise import read_pairwise_csv
+from src.taxonomy import Taxonomy, load_taxonomy_from_json
+from src.tagging import n_level_tagging, n_level_tagging_simple
+from src.tagging.batch_tagging import tag_batch
+from src.tagging.flat_tagging import get_leaf_index, tag_flat
+
+TAGGERS = {
+    "n_level": n_level_tagging.tag_n_level,
+    "simple": n_level_tagging_simple.tag_n_level,
+    "flat": tag_flat,
+}
+# Taggers that report each level through `on_level`.
+LEVELLED = {"n_level", "simple"}
+
+
+async def run_benchmark(
+    rows: list[dict],
+    taxonomy: Taxonomy,
+    tagger_name: str,
+    model: str,
+    concurrency: int
+) -> dict:
+    """
+    Tag `rows` through client_app and collect throughput and latency figures.
+
+    Per-level latency is the time from the previous level's decision (or the
+    start of the document) to this level's, so it includes waiting for a
+    concurrency slot as well as the call itself.
+    """
+    tagger = TAGGERS[tagger_name]
+    level_latencies: dict[int, list[float]] = {}
+    doc_latencies: list[float] = []
+
+    async def _timed(document: str, taxonomy: Taxonomy, **kwargs) -> dict:
+        start = last = time.perf_counter()
+
+        def on_level(level: int, parent_path: list[str], result: dict) -> None:
+            nonlocal last
+            now = time.perf_counter()
+            level_latencies.setdefault(level, []).append(now - last)
+            last = now
+
+        if tagger_name in LEVELLED:
+            kwargs["on_level"] = on_level
+        try:
+            return await tagger(document, taxonomy, **kwargs)
+        finally:
+            doc_latencies.append(time.perf_counter() - start)
+
+    totals_before = {key: sum(t.get(key, 0) for t in client_app.token_totals.values())
+                     for key in ("calls", "prompt_tokens", "completion_tokens")}
+    retries_before, failures_before = client_app.scheduler.retries, client_app.scheduler.failures
+
+    start = time.perf_counter()
+    errors = 0
+    async for record in tag_batch(rows, taxonomy, model=model, max_concurrency=concurrency, tagger=_timed):
+        errors += "error" in record
+    elapsed = time.perf_counter() - start
+
+    totals = {key: sum(t.get(key, 0) for t in client_app.token_totals.values()) - totals_before[key]
+              for key in totals_before}
+    docs = len(rows) or 1
+    return {
+        "tagger": tagger_name,
+        "docs": len(rows),
+        "errors": errors,
+        "seconds": elapsed,
+        "docs_per_sec": len(rows) / elapsed if elapsed else 0.0,
+        "calls_per_doc": totals["calls"] / docs,
+        "prompt_tokens_per_doc": totals["prompt_tokens"] / docs,
+        "completion_tokens_per_doc": totals["completion_tokens"] / docs,
+        "retries": client_app.scheduler.retries - retries_before,
+        "failed_calls": client_app.scheduler.failures - failures_before,
+        "latency": {
+            "document": _latency_summary(doc_latencies),
+            **{f"level_{level}": _latency_summary(values) for level, values in sorted(level_latencies.items())},
+        },
+    }
+
+
+def _latency_summary(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ms = [v * 1000 for v in values]
+    return {
+        "n": len(ms),
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+        "mean": statistics.fmean(ms),
+    }
+
+
+def report(result: dict) -> None:
+    print(f"--- {result['tagger']}: {result['docs']} docs in {result['seconds']:.2f}s "
+          f"({result['errors']} errors, {result['retries']} retries, {result['failed_calls']} failed calls) ---")
+    print(f"docs/sec={result['docs_per_sec']:.2f}  calls/doc={result['calls_per_doc']:.2f}  "
+          f"tokens/doc={result['prompt_tokens_per_doc']:.0f} in + {result['completion_tokens_per_doc']:.0f} out")
+    for name, summary in result["latency"].items():
+        if summary:
+            print(f"{name:<10} n={summary['n']:<6} p50={summary['p50']:8.1f} ms  p95={summary['p95']:8.1f} ms  "
+                  f"p99={summary['p99']:8.1f} ms  mean={summary['mean']:8.1f} ms")
+
+
+async def main(args) -> dict:
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    proxy_url = f"http://127.0.0.1:{args.proxy_port}"
+    stub = start_server("llms.stub_server", args.stub_port, {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_LATENCY_SIGMA": str(args.latency_sigma),
+        "STUB_429_RATE": str(args.rate_429),
+        "STUB_ERROR_RATE": str(args.error_rate),
+        "STUB_SEED": str(args.seed),
+    })
+    proxy = None if args.direct else start_server("llms.llm_route_proxy", args.proxy_port, {"LLM_ROUTER_URL": stub_url})
+
+    # every call must reach the (stub) model, and telemetry must not land in ./llm_logs
+    client_app.CACHE_PATH = ""
+    client_app.TELEMETRY_DIR = tempfile.mkdtemp(prefix="bench_tagging_")
+    # the stub ignores credentials, so a placeholder key does when none is set
+    client_app.client = client_app.create_client(stub_url if args.direct else proxy_url,
+                                                 api_key=os.environ.get("OPENAI_API_KEY") or "bench")
+
+    taxonomy = load_taxonomy_from_json(args.hierarchy, args.descriptions)
+    rows = list(read_pairwise_csv(args.dataset))[:args.limit]
+    if args.tagger == "flat":
+        get_leaf_index(taxonomy)
+
+    try:
+        await wait_until_up(f"{stub_url}/models")
+        if proxy is not None:
+            await wait_until_up(f"{proxy_url}/v1/models")
+        result = await run_benchmark(rows, taxonomy, args.tagger, args.model, args.concurrency)
+    finally:
+        await client_app.close_telemetry()
+        for server in (proxy, stub):
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report(result)
+    return result
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Offline end-to-end benchmark of the taggers against a stub LLM")
+    p.add_argument("--tagger",        type=str,   default="n_level", choices=list(TAGGERS))
+    p.add_argument("--dataset",       type=str,   default="data/dblp/pairwise_dataset_test.csv")
+    p.add_argument("--hierarchy",     type=str,   default="data/dblp/acm_ccs_hierarchy.json")
+    p.add_argument("--descriptions",  type=str,   default="data/dblp/label_description.json")
+    p.add_argument("--model",         type=str,   default="stub")
+    p.add_argument("--concurrency",   type=int,   default=16)
+    p.add_argument("--limit",         type=int,   default=None, help="Tag at most this many rows.")
+    p.add_argument("--latency_ms",    type=float, default=50, help="Median simulated upstream latency.")
+    p.add_argument("--latency_sigma", type=float, default=0.0, help="Log-normal spread of the latency (0 = fixed).")
+    p.add_argument("--rate_429",      type=float, default=0.0, help="Share of upstream calls answered with 429.")
+    p.add_argument("--error_rate",    type=float, default=0.0, help="Share of upstream calls answered with 500.")
+    p.add_argument("--seed",          type=int,   default=108)
+    p.add_argument("--direct",        action="store_true", help="Skip llm_route_proxy and call the stub directly.")
+    p.add_argument("--stub_port",     type=int,   default=4100)
+    p.add_argument("--proxy_port",    type=int,   default=4101)
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,601 @@
+# cascade.py
+# Local classifier cascade in front of the LLM tagger: one hashed-features softmax
+# model per taxonomy node, trained on the soft labels of pairwise_dataset_train.csv.
+# A level is sent to the LLM only when the local model is not confident enough.
+# Part of the training file is held out to pick each node's L2 strength, calibrate
+# the probabilities and choose the confidence threshold.
+#
+#   python -m src.tagging.cascade --target_accuracy 0.8 --limit 100
+import argparse
+import asyncio
+import functools
+import json
+import math
+import zlib
+from collections import Counter
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from llms import client_app
+from src.dataset.formatting import dblp_format
+from src.dataset.flatten import flatten_records
+from src.dataset.pairwise import LEVELS, gold_path, ground_truth_rows, read_pairwise_csv
+from src.taxonomy import Taxonomy, TaxonomyNode, load_taxonomy_from_json
+from src.tagging.batch_tagging import Tagger, tag_batch
+from src.tagging.evaluation import (HierarchyIndex, calculate_accuracy, calculate_hierarchical_metrics,
+                                    calculate_top_k_accuracy)
+from src.tagging.lexical_index import tokenize
+from src.tagging import n_level_tagging, n_level_tagging_simple
+
+
+class SparseRows:
+    """
+    Rows of hashed features in CSR layout (`row` repeats the row index per entry).
+    """
+
+    def __init__(self, row: np.ndarray, columns: np.ndarray, values: np.ndarray, n_rows: int):
+        self.row = row
+        self.columns = columns
+        self.values = values
+        self.n_rows = n_rows
+
+    def take(self, rows: np.ndarray) -> 'SparseRows':
+        """
+        The given rows, renumbered from 0 in the order given.
+        """
+        position = np.full(self.n_rows, -1, dtype=np.int64)
+        position[rows] = np.arange(len(rows))
+        keep = position[self.row] >= 0
+        return SparseRows(position[self.row[keep]], self.columns[keep], self.values[keep], len(rows))
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """
+        (n_rows, n_features) @ weights(n_features, k), with `columns` already
+        indexing rows of `weights`.
+        """
+        contributions = weights[self.columns] * self.values[:, None]
+        return np.stack([np.bincount(self.row, contributions[:, k], minlength=self.n_rows)
+                         for k in range(weights.shape[1])], axis=1)
+
+    def tdot(self, gradient: np.ndarray, n_features: int) -> np.ndarray:
+        """
+        (n_features, n_rows) @ gradient(n_rows, k).
+        """
+        contributions = gradient[self.row] * self.values[:, None]
+        return np.stack([np.bincount(self.columns, contributions[:, k], minlength=n_features)
+                         for k in range(gradient.shape[1])], axis=1)
+
+
+class HashingVectorizer:
+    """
+    Unigram + bigram features hashed into `n_features` signed buckets,
+    weighted by sublinear tf x idf and L2-normalised per document.
+    """
+
+    def __init__(self, n_features: int = 1 << 18, idf: np.ndarray | None = None):
+        self.n_features = n_features
+        self.idf = idf
+
+    def _hash(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        counts.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        buckets: dict[int, float] = {}
+        for feature, tf in counts.items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            bucket = h % self.n_features
+            buckets[bucket] = buckets.get(bucket, 0.0) + (1.0 + math.log(tf)) * (1.0 if h & 0x80000000 else -1.0)
+        columns = np.fromiter(buckets.keys(), dtype=np.int64, count=len(buckets))
+        values = np.fromiter(buckets.values(), dtype=np.float64, count=len(buckets))
+        return columns, values
+
+    def fit(self, texts: Iterable[str]) -> 'HashingVectorizer':
+        df = np.zeros(self.n_features, dtype=np.float64)
+        n = 0
+        for text in texts:
+            columns, _ = self._hash(text)
+            df[columns] += 1
+            n += 1
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts: Iterable[str]) -> SparseRows:
+        rows, all_columns, all_values = [], [], []
+        n = 0
+        for n, text in enumerate(texts, start=1):
+            columns, values = self._hash(text)
+            if self.idf is not None:
+                values = values * self.idf[columns]
+            norm = np.sqrt(np.dot(values, values))
+            rows.append(np.full(len(columns), n - 1, dtype=np.int64))
+            all_columns.append(columns)
+            all_values.append(values / norm if norm else values)
+        if not n:
+            empty = np.zeros(0, dtype=np.int64)
+            return SparseRows(empty, empty, np.zeros(0), 0)
+        return SparseRows(np.concatenate(rows), np.concatenate(all_columns), np.concatenate(all_values), n)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class NodeClassifier:
+    """
+    Multinomial logistic regression over one node's children, trained on
+    soft targets. Only the features seen in training are kept (`columns`,
+    sorted), so a model costs a few thousand rows instead of `n_features`.
+    """
+
+    def __init__(self, labels: list[str], columns: np.ndarray, weights: np.ndarray, bias: np.ndarray):
+        self.labels = labels
+        self.columns = columns
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def fit(
+        cls,
+        X: SparseRows,
+        targets: np.ndarray,
+        labels: list[str],
+        epochs: int = 60,
+        learning_rate: float = 0.2,
+        l2: float = 1e-4
+    ) -> 'NodeClassifier':
+        """
+        Full-batch Adam on the soft-target cross-entropy.
+        """
+        columns, local = np.unique(X.columns, return_inverse=True)
+        X = SparseRows(X.row, local, X.values, X.n_rows)
+        n, k = targets.shape
+        weights = np.zeros((len(columns), k))
+        bias = np.log(targets.mean(axis=0) + 1e-6)
+        moments = [[np.zeros_like(weights), np.zeros_like(weights)], [np.zeros_like(bias), np.zeros_like(bias)]]
+        beta1, beta2 = 0.9, 0.999
+        for step in range(1, epochs + 1):
+            residual = (_softmax(X.dot(weights) + bias) - targets) / n
+            gradients = (X.tdot(residual, len(columns)) + l2 * weights, residual.sum(axis=0))
+            for param, gradient, (m, v) in zip((weights, bias), gradients, moments):
+                m *= beta1
+                m += (1 - beta1) * gradient
+                v *= beta2
+                v += (1 - beta2) * gradient ** 2
+                param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + 1e-8)
+        return cls(labels, columns, weights.astype(np.float32), bias.astype(np.float32))
+
+    def logits(self, X: SparseRows) -> np.ndarray:
+        # features unseen in training carry no weight
+        position = np.searchsorted(self.columns, X.columns)
+        position = np.minimum(position, len(self.columns) - 1)
+        known = self.columns[position] == X.columns
+        X = SparseRows(X.row[known], position[known], X.values[known], X.n_rows)
+        return X.dot(self.weights) + self.bias
+
+    def predict_proba(self, X: SparseRows, temperature: float = 1.0) -> np.ndarray:
+        return _softmax(self.logits(X) / temperature)
+
+
+def _cross_entropy(logits: np.ndarray, targets: np.ndarray) -> float:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    log_probabilities = shifted - np.log(np.exp(shifted).sum(axis=1, keepdims=True))
+    return float(-(targets * log_probabilities).sum(axis=1).mean())
+
+
+def fit_temperature(logits: list[np.ndarray], gold: list[int]) -> float:
+    """
+    Temperature scaling: the single divisor of the logits that minimises the
+    negative log-likelihood of the gold labels, found by a log-spaced grid
+    search. `logits` are per-decision vectors (their lengths may differ).
+    """
+    if not logits:
+        return 1.0
+    best, best_loss = 1.0, math.inf
+    for temperature in np.geomspace(0.02, 10, 120):
+        loss = 0.0
+        for row, label in zip(logits, gold):
+            scaled = row / temperature
+            top = scaled.max()
+            loss += top + math.log(np.exp(scaled - top).sum()) - scaled[label]
+        if loss < best_loss:
+            best, best_loss = float(temperature), loss
+    return best
+
+
+def choose_threshold(decisions: list[tuple[float, bool]], target_accuracy: float, min_decisions: int = 10) -> float:
+    """
+    The lowest confidence at which the decisions taken at or above it are
+    correct at least `target_accuracy` of the time (counting at least
+    `min_decisions` of them); inf, i.e. always defer, when there is none.
+    """
+    ordered = sorted(decisions, key=lambda d: d[0], reverse=True)
+    threshold, correct = math.inf, 0
+    for taken, (confidence, is_correct) in enumerate(ordered, start=1):
+        correct += is_correct
+        # only cut between distinct confidences
+        if taken < len(ordered) and ordered[taken][0] == confidence:
+            continue
+        if taken >= min_decisions and correct / taken >= target_accuracy:
+            threshold = confidence
+    return threshold
+
+
+def held_out(row: dict, fraction: float) -> bool:
+    """
+    Deterministic validation split on the row id.
+    """
+    return zlib.crc32(str(row.get("id")).encode("utf-8")) % 1000 < fraction * 1000
+
+
+def _soft_targets(row: dict, level: int, labels: list[str], sharpen: float) -> np.ndarray | None:
+    # soft labels are independent relevance scores (0.1 spread over every
+    # unrelated category is common); raising them to a power before
+    # normalising keeps the ranking but stops the model learning that spread
+    scores = dict(row["soft_labels"].get(level) or [])
+    target = np.array([max(scores.get(label, 0.0), 0.0) for label in labels]) ** sharpen
+    total = target.sum()
+    return target / total if total > 0 else None
+
+
+def _nodes_with_members(rows: list[dict], taxonomy: Taxonomy) -> Iterator[tuple[tuple[str, ...], list[str], list[int]]]:
+    """
+    (path, child labels, row indexes) for every internal node down to the
+    annotated depth: all rows at the root, below it the rows whose
+    `relevant_children_l*` put them on that node's path.
+    """
+    stack = [(taxonomy.root, (), list(range(len(rows))))]
+    while stack:
+        node, path, members = stack.pop()
+        level = len(path) + 1
+        if level > max(LEVELS) or not node.children or not members:
+            continue
+        yield path, list(node.children), members
+        for name, child in node.children.items():
+            stack.append((child, path + (name,), [i for i in members if name in rows[i]["relevant"][level]]))
+
+
+def _gold_index(row: dict, level: int, labels: list[str]) -> int | None:
+    """
+    Position in `labels` of the row's reference label at `level` (as in `gold_path`).
+    """
+    path = gold_path(row)
+    if len(path) < level or path[level - 1] not in labels:
+        return None
+    return labels.index(path[level - 1])
+
+
+class LocalCascade:
+    """
+    Per-node local classifiers consulted before the LLM.
+
+    `decide(document, options, parent_path)` returns a level result in the
+    shape of `CandidatesStrategy.to_result` (plus "source": "cascade") when the
+    node's model puts at least the level's threshold probability on one
+    option, and None otherwise, so the caller falls back to `choose_intents`.
+    Probabilities are calibrated by the level's temperature. `threshold` and
+    `temperature` are either one value for every level or {level: value}.
+    Nodes without enough training data always defer. Counts of both outcomes
+    go to `stats`.
+    """
+
+    def __init__(self, vectorizer: HashingVectorizer, models: dict[tuple[str, ...], NodeClassifier],
+                 threshold: float | dict[int, float] = 0.7, temperature: float | dict[int, float] = 1.0):
+        self.vectorizer = vectorizer
+        self.models = models
+        self.threshold = threshold
+        self.temperature = temperature
+        # evaluate_local on the held-out rows, filled in by `train`
+        self.validation: dict | None = None
+        self.stats: Counter = Counter()
+
+    def threshold_at(self, level: int) -> float:
+        return self.threshold.get(level, math.inf) if isinstance(self.threshold, dict) else self.threshold
+
+    def temperature_at(self, level: int) -> float:
+        return self.temperature.get(level, 1.0) if isinstance(self.temperature, dict) else self.temperature
+
+    @classmethod
+    def train(
+        cls,
+        rows: list[dict],
+        taxonomy: Taxonomy,
+        formatter: Callable[[dict], str] = dblp_format,
+        threshold: float | None = None,
+        target_accuracy: float = 0.8,
+        validation_fraction: float = 0.2,
+        min_examples: int = 20,
+        sharpen: float = 4.0,
+        n_features: int = 1 << 18,
+        l2_grid: tuple[float, ...] = (1e-4, 3e-4, 1e-3),
+        **fit_kwargs
+    ) -> 'LocalCascade':
+        """
+        Train one classifier per taxonomy node down to the annotated depth.
+
+        The root's model learns `soft_labels_l1` over all rows; a node at depth
+        d learns `soft_labels_l{d+1}` (restricted to its children) over the rows
+        whose `relevant_children_l*` put them on that node's path. Targets
+        are the soft scores raised to `sharpen` and normalised.
+
+        A `validation_fraction` of the rows (split on the row id) is held out.
+        On it, each node's L2 strength is picked from `l2_grid` by soft-target
+        cross-entropy, one temperature per level is fitted to calibrate that
+        level's models, and, unless `threshold` is given, each level's
+        threshold is the lowest confidence whose local decisions there reach
+        `target_accuracy`.
+        """
+        texts = [formatter(row) for row in rows]
+        validation = np.asarray([held_out(row, validation_fraction) for row in rows], dtype=bool)
+        vectorizer = HashingVectorizer(n_features).fit(text for text, v in zip(texts, validation) if not v)
+        X = vectorizer.transform(texts)
+        models = {}
+        # level -> (logits, gold index) of the held-out rows at that level's nodes
+        held_logits: dict[int, list[np.ndarray]] = {}
+        held_gold: dict[int, list[int]] = {}
+        for path, labels, members in _nodes_with_members(rows, taxonomy):
+            level = len(path) + 1
+            fit, check = [], []
+            for i in members:
+                target = _soft_targets(rows[i], level, labels, sharpen)
+                if target is not None:
+                    (check if validation[i] else fit).append((i, target))
+            if len(fit) < min_examples:
+                continue
+
+            X_fit = X.take(np.asarray([i for i, _ in fit]))
+            y_fit = np.stack([target for _, target in fit])
+            if len(check) >= 5:
+                X_check = X.take(np.asarray([i for i, _ in check]))
+                y_check = np.stack([target for _, target in check])
+                candidates = [NodeClassifier.fit(X_fit, y_fit, labels, l2=l2, **fit_kwargs) for l2 in l2_grid]
+                model = min(candidates, key=lambda m: _cross_entropy(m.logits(X_check), y_check))
+            else:
+                model = NodeClassifier.fit(X_fit, y_fit, labels, l2=l2_grid[len(l2_grid) // 2], **fit_kwargs)
+            models[path] = model
+
+            gold = [(i, _gold_index(rows[i], level, labels)) for i in members if validation[i]]
+            gold = [(i, g) for i, g in gold if g is not None]
+            if gold:
+                held_logits.setdefault(level, []).extend(model.logits(X.take(np.asarray([i for i, _ in gold]))))
+                held_gold.setdefault(level, []).extend(g for _, g in gold)
+
+        temperature = {level: fit_temperature(held_logits[level], held_gold[level]) for level in held_logits}
+        cascade = cls(vectorizer, models, math.inf, temperature)
+        held = [row for row, v in zip(rows, validation) if v]
+        if threshold is None:
+            decisions: dict[int, list[tuple[float, bool]]] = {level: [] for level in LEVELS}
+            for level, confidence, correct in _local_decisions(cascade, held, formatter):
+                if confidence is not None:
+                    decisions[level].append((confidence, correct))
+            threshold = {level: choose_threshold(decisions[level], target_accuracy) for level in LEVELS}
+        cascade.threshold = threshold
+        cascade.validation = evaluate_local(cascade, held, formatter)
+        return cascade
+
+    def predict(self, document: str, parent_path: list[str]) -> list[tuple[str, float]] | None:
+        """
+        The node's children ranked by calibrated probability, or None without a model.
+        """
+        model = self.models.get(tuple(parent_path))
+        if model is None:
+            return None
+        temperature = self.temperature_at(len(parent_path) + 1)
+        probabilities = model.predict_proba(self.vectorizer.transform([document]), temperature)[0]
+        order = np.argsort(-probabilities)
+        return [(model.labels[i], float(probabilities[i])) for i in order]
+
+    def decide(self, document: str, options: list[TaxonomyNode], parent_path: list[str]) -> dict | None:
+        ranked = self.predict(document, parent_path)
+        if ranked is None:
+            self.stats["untrained"] += 1
+            return None
+        names = {opt.name for opt in options}
+        ranked = [(label, p) for label, p in ranked if label in names]
+        if not ranked or ranked[0][1] < self.threshold_at(len(parent_path) + 1):
+            self.stats["deferred"] += 1
+            return None
+        self.stats["local"] += 1
+        candidates = [
+            {"label": label, "confidence": p, "rationale": f"local classifier, p={p:.2f}"}
+            for label, p in ranked[:3]
+        ]
+        return {
+            "prediction": candidates[0]["label"],
+            "rationale": candidates[0]["rationale"],
+            "confidence": candidates[0]["confidence"],
+            "candidates": candidates,
+            "source": "cascade",
+            "children": {}
+        }
+
+    def save(self, path: str) -> None:
+        arrays = {"idf": self.vectorizer.idf}
+        nodes = []
+        for i, (node_path, model) in enumerate(self.models.items()):
+            nodes.append({"path": list(node_path), "labels": model.labels})
+            arrays[f"columns_{i}"] = model.columns
+            arrays[f"weights_{i}"] = model.weights
+            arrays[f"bias_{i}"] = model.bias
+        meta = {"n_features": self.vectorizer.n_features, "threshold": self.threshold,
+                "temperature": self.temperature, "nodes": nodes}
+        # JSON has no Infinity in the standard; store "never local" as null
+        for key in ("threshold", "temperature"):
+            if isinstance(meta[key], dict):
+                meta[key] = {str(level): (None if math.isinf(v) else v) for level, v in meta[key].items()}
+            elif math.isinf(meta[key]):
+                meta[key] = None
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str, threshold: float | None = None) -> 'LocalCascade':
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            vectorizer = HashingVectorizer(meta["n_features"], data["idf"])
+            models = {
+                tuple(node["path"]): NodeClassifier(node["labels"], data[f"columns_{i}"],
+                                                    data[f"weights_{i}"], data[f"bias_{i}"])
+                for i, node in enumerate(meta["nodes"])
+            }
+        for key, missing in (("threshold", math.inf), ("temperature", 1.0)):
+            value = meta.get(key, missing)
+            if isinstance(value, dict):
+                meta[key] = {int(level): (missing if v is None else v) for level, v in value.items()}
+            else:
+                meta[key] = missing if value is None else value
+        return cls(vectorizer, models, meta["threshold"] if threshold is None else threshold, meta["temperature"])
+
+
+def _local_decisions(cascade: LocalCascade, rows: list[dict],
+                     formatter: Callable[[dict], str]) -> Iterator[tuple[int, float | None, bool]]:
+    """
+    (level, top calibrated probability, whether that label is relevant) along
+    each row's gold path; the probability is None where no model exists.
+    """
+    for row in rows:
+        document = formatter(row)
+        path = gold_path(row)
+        for level in range(1, len(path) + 1):
+            ranked = cascade.predict(document, path[:level - 1])
+            if not ranked:
+                yield level, None, False
+            else:
+                yield level, ranked[0][1], ranked[0][0] in row["relevant"][level]
+
+
+def evaluate_local(cascade: LocalCascade, rows: list[dict], formatter: Callable[[dict], str] = dblp_format) -> dict:
+    """
+    Offline estimate, no LLM involved: walk each row's gold path and report,
+    per level, the share of decisions the cascade would take locally and how
+    often those are one of the row's relevant labels.
+    """
+    report = {level: {"decisions": 0, "local": 0, "correct": 0} for level in LEVELS}
+    for level, confidence, correct in _local_decisions(cascade, rows, formatter):
+        counts = report[level]
+        counts["decisions"] += 1
+        if confidence is not None and confidence >= cascade.threshold_at(level):
+            counts["local"] += 1
+            counts["correct"] += correct
+    for counts in report.values():
+        counts["coverage"] = counts["local"] / counts["decisions"] if counts["decisions"] else 0.0
+        counts["local_accuracy"] = counts["correct"] / counts["local"] if counts["local"] else 0.0
+    return report
+
+
+def _calls() -> int:
+    # cache hits count as calls: they are requests the cascade did not avoid
+    cache = client_app.get_response_cache()
+    hits = cache.hits if cache is not None else 0
+    return hits + sum(totals.get("calls", 0) for totals in client_app.token_totals.values())
+
+
+async def run_and_score(
+    rows: list[dict],
+    taxonomy: Taxonomy,
+    tagger: Tagger,
+    model: str,
+    max_concurrency: int,
+    ground_truths: list[dict],
+    hierarchy: HierarchyIndex
+) -> dict:
+    """
+    Tag `rows`, flatten the results and score them with `src.tagging.evaluation`.
+    """
+    before = _calls()
+    records = [
+        record async for record in
+        tag_batch(rows, taxonomy, model=model, max_concurrency=max_concurrency, tagger=tagger)
+    ]
+    examples = list(flatten_records(r for r in records if r.get("response")))
+    return {
+        "llm_calls": _calls() - before,
+        "errors": sum("error" in r for r in records),
+        "accuracy": calculate_accuracy(examples, ground_truths),
+        "top_3_accuracy": calculate_top_k_accuracy(examples, ground_truths, k=3),
+        **{f"hier_{k}": v for k, v in calculate_hierarchical_metrics(examples, ground_truths, hierarchy).items()
+           if k != "count"},
+    }
+
+
+TAGGERS = {
+    "n_level": n_level_tagging.tag_n_level,
+    "simple": n_level_tagging_simple.tag_n_level,
+}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    taxonomy = load_taxonomy_from_json(args.hierarchy, args.descriptions)
+    known = set(taxonomy.names())
+    if args.load:
+        cascade = LocalCascade.load(args.load, args.threshold)
+    else:
+        cascade = LocalCascade.train(list(read_pairwise_csv(args.train, known)), taxonomy,
+                                     threshold=args.threshold, target_accuracy=args.target_accuracy,
+                                     validation_fraction=args.validation_fraction, min_examples=args.min_examples)
+        if args.save:
+            cascade.save(args.save)
+    print(f"Local models for {len(cascade.models)} nodes")
+    for level in LEVELS:
+        print(f"level {level}: threshold {cascade.threshold_at(level):.3f}, "
+              f"temperature {cascade.temperature_at(level):.3f}")
+
+    def _print(name: str, report: dict) -> None:
+        for level, counts in report.items():
+            print(f"{name} level {level}: local coverage {counts['coverage']:.1%}, "
+                  f"local accuracy {counts['local_accuracy']:.1%} ({counts['local']}/{counts['decisions']})")
+
+    if cascade.validation is not None:
+        _print("validation", cascade.validation)
+    rows = list(read_pairwise_csv(args.dataset, known))[:args.limit]
+    offline = evaluate_local(cascade, rows)
+    _print("test", offline)
+    if args.offline:
+        return {"validation": cascade.validation, "offline": offline}
+
+    # a cache warmed by the baseline run would answer the cascade run's calls
+    if not args.cache:
+        client_app.CACHE_PATH = ""
+    ground_truths = list(ground_truth_rows(rows))
+    hierarchy = HierarchyIndex(taxonomy)
+    tagger = TAGGERS[args.tagger]
+    baseline = await run_and_score(rows, taxonomy, tagger, args.model, args.max_concurrency,
+                                   ground_truths, hierarchy)
+    cascade.stats.clear()
+    cascaded = await run_and_score(rows, taxonomy, functools.partial(tagger, cascade=cascade.decide),
+                                   args.model, args.max_concurrency, ground_truths, hierarchy)
+
+    print(f"{'':>22} | {'LLM only':>10} | {'cascade':>10} | {'delta':>10}")
+    for key in baseline:
+        delta = cascaded[key] - baseline[key]
+        print(f"{key:>22} | {baseline[key]:>10.4g} | {cascaded[key]:>10.4g} | {delta:>+10.4g}")
+    saved = baseline["llm_calls"] - cascaded["llm_calls"]
+    print(f"Cascade decided {cascade.stats['local']} levels locally; "
+          f"LLM calls saved: {saved} ({saved / (baseline['llm_calls'] or 1):.1%})")
+    return {"validation": cascade.validation, "offline": offline, "baseline": baseline, "cascade": cascaded,
+            "stats": dict(cascade.stats)}
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Train the local classifier cascade and measure what it saves")
+    p.add_argument("--train",           type=str,   default="data/dblp/pairwise_dataset_train.csv")
+    p.add_argument("--dataset",         type=str,   default="data/dblp/pairwise_dataset_test.csv")
+    p.add_argument("--hierarchy",       type=str,   default="data/dblp/acm_ccs_hierarchy.json")
+    p.add_argument("--descriptions",    type=str,   default="data/dblp/label_description.json")
+    p.add_argument("--threshold",       type=float, default=None,
+                   help="Minimum local probability to skip the LLM (default: chosen on the validation split).")
+    p.add_argument("--target_accuracy", type=float, default=0.8,
+                   help="Local accuracy the chosen threshold must reach on the validation split.")
+    p.add_argument("--validation_fraction", type=float, default=0.2, help="Share of --train held out.")
+    p.add_argument("--min_examples",    type=int,   default=20, help="Nodes with fewer training rows always defer.")
+    p.add_argument("--save",            type=str,   default=None, help="Write the trained cascade (.npz).")
+    p.add_argument("--load",            type=str,   default=None, help="Use a saved cascade instead of training.")
+    p.add_argument("--offline",         action="store_true", help="Only report the gold-path estimate, no LLM calls.")
+    p.add_argument("--tagger",          type=str,   default="n_level", choices=list(TAGGERS))
+    p.add_argument("--model",           type=str,   default="local-qwen3:0.6b")
+    p.add_argument("--max_concurrency", type=int,   default=5)
+    p.add_argument("--limit",           type=int,   default=None)
+    p.add_argument("--cache",           action="store_true",
+                   help="Use the LLM response cache (./llm_cache.sqlite or LLM_CACHE_PATH); hits still count as calls.")
+    asyncio.run(main(p.parse_args()))
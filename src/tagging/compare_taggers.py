@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from llms import client_app
+from llms.bench_proxy import percentile
+from src.dataset.pairwise import LEVELS, read_pairwise_csv
+from src.taxonomy import Taxonomy, load_taxonomy_from_json
+from src.tagging.batch_tagging import Tagger, tag_batch
+from src.tagging.flat_tagging import get_leaf_index, tag_flat
+from src.tagging.n_level_tagging import tag_n_level
+
+TAGGERS: dict[str, Tagger] = {
+    "n_level": tag_n_level,
+    "flat": tag_flat,
+}
+
+
+def predicted_path(response: dict | None) -> list[str]:
+    """
+    Follow the `prediction`/`children` chain of a tagger result.
+    """
+    path = []
+    while response and response.get("prediction"):
+        path.append(response["prediction"])
+        response = response.get("children")
+    return path
+
+
+def _token_snapshot() -> dict[str, int]:
+    keys = ("calls", "prompt_tokens", "completion_tokens")
+    return {key: sum(totals.get(key, 0) for totals in client_app.token_totals.values()) for key in keys}
+
+
+async def run_tagger(
+    name: str,
+    rows: list[dict],
+    taxonomy: Taxonomy,
+    model: str,
+    max_concurrency: int
+) -> dict:
+    """
+    Tag `rows` with one tagger and summarise calls, tokens, latency and per-level accuracy.
+    """
+    tagger = TAGGERS[name]
+    latencies: list[float] = []
+
+    async def _timed(document: str, taxonomy: Taxonomy, **kwargs) -> dict:
+        start = time.perf_counter()
+        try:
+            return await tagger(document, taxonomy, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    before = _token_snapshot()
+    start = time.perf_counter()
+    records = [
+        record async for record in
+        tag_batch(rows, taxonomy, model=model, max_concurrency=max_concurrency, tagger=_timed)
+    ]
+    wall_clock = time.perf_counter() - start
+    after = _token_snapshot()
+
+    correct = {level: 0 for level in LEVELS}
+    errors = 0
+    for record in records:
+        errors += "error" in record
+        path = predicted_path(record["response"])
+        for level in LEVELS:
+            if len(path) >= level and path[level - 1] in record["example"]["relevant"][level]:
+                correct[level] += 1
+
+    n = len(records) or 1
+    values = latencies or [0.0]
+    return {
+        "tagger": name,
+        "documents": len(records),
+        "errors": errors,
+        **{key: after[key] - before[key] for key in after},
+        "latency_p50": statistics.median(values),
+        "latency_p95": percentile(values, 95),
+        "latency_p99": percentile(values, 99),
+        "latency_mean": statistics.fmean(values),
+        "wall_clock": wall_clock,
+        **{f"accuracy_l{level}": correct[level] / n for level in LEVELS},
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    columns = list(results[0].keys())
+    print(" | ".join(f"{column:>17}" for column in columns))
+    for result in results:
+        cells = [f"{v:>17.3f}" if isinstance(v, float) else f"{v!s:>17}" for v in result.values()]
+        print(" | ".join(cells))
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    if args.no_cache:
+        # every call must reach the model for the counts to be comparable
+        client_app.CACHE_PATH = ""
+    taxonomy = load_taxonomy_from_json(args.hierarchy, args.descriptions)
+    known = taxonomy.names()
+    rows = list(read_pairwise_csv(args.dataset, known))[:args.limit]
+    # build the BM25 index up front so it is not billed to the first document
+    get_leaf_index(taxonomy)
+
+    results = []
+    for name in args.taggers:
+        results.append(await run_tagger(name, rows, taxonomy, args.model, args.max_concurrency))
+    print_report(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the level-by-level and flat taggers.")
+    parser.add_argument("--dataset", default="data/dblp/pairwise_dataset_test.csv")
+    parser.add_argument("--hierarchy", default="data/dblp/acm_ccs_hierarchy.json")
+    parser.add_argument("--descriptions", default="data/dblp/label_description.json")
+    parser.add_argument("--model", default="local-qwen3:0.6b")
+    parser.add_argument("--taggers", nargs="+", default=list(TAGGERS), choices=list(TAGGERS))
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--max_concurrency", type=int, default=5)
+    parser.add_argument("--no_cache", action="store_true", help="bypass the LLM response cache")
+    asyncio.run(main(parser.parse_args()))
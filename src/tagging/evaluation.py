@@ -1,3 +1,8 @@
+import numpy as np
+
+from src.taxonomy import Taxonomy
+from src.tagging.evaluation_engine import GroundTruthIndex, LabelVocabulary
+
 def match_exact(example : str, ground_truth : str) -> bool:
     return example.lower() == ground_truth.lower()
 
@@ -9,11 +14,6 @@ def evaluate_example_in_top(example : dict, ground_truth : dict, k=3) -> bool:
     return ground_truth["label"] in soft_targets
 
 
-import collections
-
-
-import collections
-
 def calculate_top_k_accuracy(examples, ground_truths, k=3) -> float:
     """
     Calculates the top-k accuracy for a given dataset.
@@ -42,48 +42,16 @@ def calculate_top_k_accuracy(examples, ground_truths, k=3) -> float:
         print("No examples to evaluate.")
         return 0.0
 
-    # Create a lookup for ground truths for efficient access.
-    # The key is a tuple of (paper_id, level) for unique identification.
-    ground_truth_map = {
-        (gt['paper_id'], gt['level']): gt for gt in ground_truths
-    }
+    # To sweep several k or runs, build the GroundTruthIndex once and reuse it.
+    return GroundTruthIndex(ground_truths, max_k=k).evaluate(examples).top_k_accuracy()[k]
 
-    correct_predictions = 0
-    total_examples = len(examples)
-
-    # Iterate through each example to evaluate its prediction.
-    for example in examples:
-        key = (example['paper_id'], example['level'])
-        ground_truth = ground_truth_map.get(key)
-
-        # A prediction can only be correct if a corresponding ground truth exists.
-        if ground_truth:
-            predicted_label = example['label']
-
-            # Get the top-k labels from the soft targets of the ground truth.
-            # Sort by confidence in descending order to get the top predictions.
-            soft_targets = ground_truth.get('soft_targets', [])
-            top_k_labels = [
-                target['label'] for target in sorted(
-                    soft_targets,
-                    key=lambda x: x.get('confidence', 0),
-                    reverse=True
-                )[:k]
-            ]
-
-            # Check if the predicted label is in the top-k ground truth labels.
-            if predicted_label in top_k_labels:
-                correct_predictions += 1
-
-    # Calculate the accuracy as the fraction of correct predictions.
-    return correct_predictions / total_examples if total_examples > 0 else 0.0
 
 def calculate_accuracy(examples, ground_truths) -> float:
     """
-    Calculates the top-k accuracy for a given dataset.
+    Calculates the exact-match accuracy for a given dataset.
 
     This metric measures the proportion of examples where the predicted 'label'
-    is present within the top-k 'soft_targets' of the corresponding ground truth.
+    equals the 'label' of the corresponding ground truth, ignoring case.
     The matching between an example and a ground truth is done based on
     'paper_id' and 'level'.
 
@@ -94,11 +62,9 @@ def calculate_accuracy(examples, ground_truths) -> float:
             represents the ground truth and must contain 'paper_id', 'level',
             and 'soft_targets' keys. The 'soft_targets' is a list of dicts,
             each with a 'label' and 'confidence'.
-        k (int, optional): The number of top soft targets to consider for a match.
-            Defaults to 3.
 
     Returns:
-        float: The top-k accuracy, a value between 0.0 and 1.0. Returns 0.0
+        float: The accuracy, a value between 0.0 and 1.0. Returns 0.0
             if the examples list is empty.
     """
     # If there are no examples to evaluate, the accuracy is 0.
@@ -106,34 +72,176 @@ def calculate_accuracy(examples, ground_truths) -> float:
         print("No examples to evaluate.")
         return 0.0
 
-    # Create a lookup for ground truths for efficient access.
-    # The key is a tuple of (paper_id, level) for unique identification.
-    ground_truth_map = {
-        (gt['paper_id'], gt['level']): gt for gt in ground_truths
-    }
+    # labels compare case-insensitively, as in `match_exact`
+    truth = GroundTruthIndex(ground_truths, max_k=1, vocabulary=LabelVocabulary(fold_case=True))
+    return truth.evaluate(examples).accuracy()
 
-    correct_predictions = 0
-    total_examples = len(examples)
 
-    # Iterate through each example to evaluate its prediction.
-    for example in examples:
-        key = (example['paper_id'], example['level'])
-        ground_truth = ground_truth_map.get(key)
+class HierarchyIndex:
+    """
+    Precomputed tables for hierarchy-aware scoring of a `Taxonomy` (or `FrozenTaxonomy`).
 
-        # A prediction can only be correct if a corresponding ground truth exists.
-        if ground_truth:
-            predicted_label = example['label']
+    Nodes are numbered in depth-first order (the root is 0). An Euler tour with
+    a sparse table of depth minima answers lowest-common-ancestor queries in
+    O(1), and `ancestors[node, d]` holds the ancestor of `node` at depth d
+    (-1 below the node). All queries take and return NumPy arrays.
+    """
 
-            # Get the top-k labels from the soft targets of the ground truth.
-            # Sort by confidence in descending order to get the top predictions.
-            ground_truth_label = ground_truth.get('soft_targets', "")
+    def __init__(self, taxonomy: Taxonomy):
+        self.names: list[str] = []
+        self.paths: dict[tuple[str, ...], int] = {}
+        self.by_name: dict[str, int] = {}
+        parents, depths, euler, first = [], [], [], []
+
+        def _visit(node, parent: int, path: tuple[str, ...]) -> int:
+            index = len(self.names)
+            self.names.append(node.name)
+            parents.append(parent)
+            depths.append(len(path))
+            first.append(len(euler))
+            euler.append(index)
+            if path:
+                self.paths[path] = index
+                self.by_name.setdefault(node.name, index)
+            return index
+
+        stack = [(_visit(taxonomy.root, -1, ()), iter(taxonomy.root.children.values()), ())]
+        while stack:
+            index, children, path = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if stack:
+                    # back in the parent after finishing this subtree
+                    euler.append(stack[-1][0])
+                continue
+            child_path = path + (child.name,)
+            stack.append((_visit(child, index, child_path), iter(child.children.values()), child_path))
+
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.depths = np.asarray(depths, dtype=np.int64)
+        self.first = np.asarray(first, dtype=np.int64)
+        self.euler = np.asarray(euler, dtype=np.int64)
+
+        # sparse[j][i]: position in the Euler tour of the shallowest node in euler[i : i + 2**j]
+        euler_depths = self.depths[self.euler]
+        self.sparse = [np.arange(len(self.euler))]
+        span = 1
+        while 2 * span <= len(self.euler):
+            previous = self.sparse[-1]
+            left, right = previous[:len(previous) - span], previous[span:]
+            self.sparse.append(np.where(euler_depths[left] <= euler_depths[right], left, right))
+            span *= 2
+
+        # nodes are numbered in pre-order, so a parent's row is filled before its children's
+        self.ancestors = np.full((len(self.names), int(self.depths.max()) + 1), -1, dtype=np.int64)
+        for index in range(len(self.names)):
+            if parents[index] >= 0:
+                self.ancestors[index] = self.ancestors[parents[index]]
+            self.ancestors[index, depths[index]] = index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, label: str | None, parent_path: list[str] | None = None) -> int:
+        """
+        Node for a label, preferring its full path when a parent path is known.
+        Unknown labels resolve to the root (0), i.e. no credit below the root.
+        """
+        if label is None:
+            return 0
+        if parent_path is not None:
+            index = self.paths.get(tuple(parent_path) + (label,))
+            if index is not None:
+                return index
+        return self.by_name.get(label, 0)
+
+    def lca(self, u, v) -> np.ndarray:
+        u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+        left = np.minimum(self.first[u], self.first[v])
+        right = np.maximum(self.first[u], self.first[v]) + 1
+        level = np.floor(np.log2(right - left)).astype(np.int64)
+        result = np.empty(np.broadcast(left, right).shape, dtype=np.int64)
+        for j in np.unique(level):
+            mask = level == j
+            a = self.sparse[j][left[mask]]
+            b = self.sparse[j][right[mask] - (1 << j)]
+            euler_depths = self.depths[self.euler[a]], self.depths[self.euler[b]]
+            result[mask] = self.euler[np.where(euler_depths[0] <= euler_depths[1], a, b)]
+        return result
+
+    def distance(self, u, v) -> np.ndarray:
+        """
+        Number of edges between u and v through their lowest common ancestor.
+        """
+        common = self.lca(u, v)
+        return self.depths[u] + self.depths[v] - 2 * self.depths[common]
+
+    def ancestor_at(self, nodes, depth: int) -> np.ndarray:
+        return self.ancestors[np.asarray(nodes, dtype=np.int64), depth]
+
+    def score(self, predicted, gold) -> dict[str, float]:
+        """
+        Hierarchical metrics for aligned arrays of predicted and gold nodes.
+
+        Each node stands for its set of ancestors (itself included, the root
+        excluded), so the overlap of a pair is the depth of its LCA:
+          - precision / recall / f1: micro-averaged set-based hP, hR, hF
+          - lca_distance: mean tree distance between prediction and gold
+          - partial_credit: mean depth(LCA) / max(depth(pred), depth(gold)),
+            1 for an exact match and 0 for a different top-level branch
+        """
+        predicted, gold = np.asarray(predicted, dtype=np.int64), np.asarray(gold, dtype=np.int64)
+        if not len(predicted):
+            return {"precision": 0.0, "recall": 0.0, "f1": 0.0, "lca_distance": 0.0, "partial_credit": 0.0}
+        common = self.depths[self.lca(predicted, gold)]
+        predicted_depth, gold_depth = self.depths[predicted], self.depths[gold]
+        precision = common.sum() / predicted_depth.sum() if predicted_depth.sum() else 0.0
+        recall = common.sum() / gold_depth.sum() if gold_depth.sum() else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        deepest = np.maximum(np.maximum(predicted_depth, gold_depth), 1)
+        return {
+            "precision": float(precision),
+            "recall": float(recall),
+            "f1": float(f1),
+            "lca_distance": float((predicted_depth + gold_depth - 2 * common).mean()),
+            "partial_credit": float((common / deepest).mean()),
+        }
 
-            # Check if the predicted label is in the top-k ground truth labels.
-            if match_exact(example["label"], ground_truth_label):
-                correct_predictions += 1
 
-    # Calculate the accuracy as the fraction of correct predictions.
-    return correct_predictions / total_examples if total_examples > 0 else 0.0
+def calculate_hierarchical_metrics(examples, ground_truths, hierarchy: HierarchyIndex | Taxonomy) -> dict:
+    """
+    Hierarchy-aware counterpart of `calculate_accuracy`.
+
+    Predictions and ground truths are matched on 'paper_id' and 'level' as
+    in the other metrics, and each 'label' is placed in the taxonomy through
+    its 'parent_path' when present. Unlike flat matching, a prediction under
+    the right parent but on the wrong leaf earns partial credit.
+
+    Args:
+        examples (list[dict]): Predictions with 'paper_id', 'level', 'label'
+            and optionally 'parent_path'.
+        ground_truths (list[dict]): Ground truths with the same keys.
+        hierarchy: A `HierarchyIndex`, or a taxonomy to build one from. Build
+            the index once and pass it in when scoring several runs.
+
+    Returns:
+        dict: 'count' (matched examples) plus the metrics of `HierarchyIndex.score`.
+    """
+    if not isinstance(hierarchy, HierarchyIndex):
+        hierarchy = HierarchyIndex(hierarchy)
+
+    ground_truth_map = {
+        (gt['paper_id'], gt['level']): gt for gt in ground_truths
+    }
+    predicted, gold = [], []
+    for example in examples:
+        ground_truth = ground_truth_map.get((example['paper_id'], example['level']))
+        if ground_truth is None:
+            continue
+        predicted.append(hierarchy.resolve(example.get('label'), example.get('parent_path')))
+        gold.append(hierarchy.resolve(ground_truth.get('label'), ground_truth.get('parent_path')))
+    return {"count": len(predicted), **hierarchy.score(predicted, gold)}
 
 
 if __name__ == "__main__":
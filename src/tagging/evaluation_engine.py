@@ -0,0 +1,212 @@
+from typing import Iterable
+
+import numpy as np
+
+MISSING = -1
+
+
+class LabelVocabulary:
+    """
+    Interns label strings as dense integer ids, shared by predictions and ground truth.
+
+    With `fold_case`, labels differing only in case share an id (as
+    `evaluation.match_exact` compares them); `labels` keeps the first spelling seen.
+    """
+
+    def __init__(self, fold_case: bool = False):
+        self.fold_case = fold_case
+        self.ids: dict[str, int] = {}
+        self.labels: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def id(self, label: str | None) -> int:
+        if label is None:
+            return MISSING
+        key = label.lower() if self.fold_case else label
+        label_id = self.ids.get(key)
+        if label_id is None:
+            label_id = self.ids[key] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def label(self, label_id: int) -> str | None:
+        """
+        The label for an id, None for MISSING.
+        """
+        return None if label_id == MISSING else self.labels[label_id]
+
+    def path(self, record: dict) -> list[int]:
+        """
+        Ids of a record's parent_path followed by its own label.
+        """
+        return [self.id(label) for label in record.get("parent_path") or []] + [self.id(record.get("label"))]
+
+
+def _pad(rows: list[list[int]], width: int) -> np.ndarray:
+    matrix = np.full((len(rows), width), MISSING, dtype=np.int64)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row[:width]
+    return matrix
+
+
+class GroundTruthIndex:
+    """
+    Ground truth in columnar form, built once and reused for every set of
+    predictions evaluated against it.
+
+    Each (paper_id, level) row holds the gold label id, its root-to-label path
+    ids and the ids of its `max_k` best soft targets ranked by confidence (ties
+    keep file order, as `calculate_top_k_accuracy` does).
+    """
+
+    def __init__(self, ground_truths: Iterable[dict], max_k: int = 5, vocabulary: LabelVocabulary | None = None):
+        self.max_k = max_k
+        self.vocabulary = vocabulary if vocabulary is not None else LabelVocabulary()
+        # later duplicates of a (paper_id, level) win, as in the original evaluator's dict
+        by_key = {(gt["paper_id"], gt["level"]): gt for gt in ground_truths}
+        self.rows: dict[tuple, int] = {key: row for row, key in enumerate(by_key)}
+        labels, paths, soft = [], [], []
+        for gt in by_key.values():
+            ranked = sorted(gt.get("soft_targets") or [], key=lambda t: t.get("confidence", 0), reverse=True)
+            labels.append(self.vocabulary.id(gt.get("label")))
+            paths.append(self.vocabulary.path(gt))
+            soft.append([self.vocabulary.id(t["label"]) for t in ranked[:max_k]])
+
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.depth = max((len(path) for path in paths), default=1)
+        self.paths = _pad(paths, self.depth)
+        self.soft = _pad(soft, max_k)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def evaluate(self, examples: Iterable[dict]) -> 'Evaluation':
+        """
+        Align predictions ({paper_id, level, label[, parent_path]}) with the ground truth.
+        """
+        rows, levels, predicted, paths = [], [], [], []
+        for example in examples:
+            rows.append(self.rows.get((example["paper_id"], example["level"]), MISSING))
+            levels.append(example["level"])
+            predicted.append(self.vocabulary.id(example.get("label")))
+            paths.append(self.vocabulary.path(example))
+        return Evaluation(self, np.asarray(rows, dtype=np.int64), np.asarray(levels),
+                          np.asarray(predicted, dtype=np.int64), paths)
+
+
+class Evaluation:
+    """
+    One run's predictions aligned with a `GroundTruthIndex`. Every metric is a
+    handful of array operations over all examples; as in the original
+    evaluator, examples without ground truth count as wrong.
+    """
+
+    def __init__(self, truth: GroundTruthIndex, rows: np.ndarray, levels: np.ndarray,
+                 predicted: np.ndarray, paths: list[list[int]]):
+        self.truth = truth
+        self.levels = levels
+        self.predicted = predicted
+        self.has_truth = rows != MISSING
+        safe_rows = np.where(self.has_truth, rows, 0)
+        n = len(rows)
+        if len(truth):
+            self.gold = np.where(self.has_truth, truth.labels[safe_rows], MISSING)
+            self.soft = np.where(self.has_truth[:, None], truth.soft[safe_rows], MISSING)
+            self.gold_paths = np.where(self.has_truth[:, None], truth.paths[safe_rows], MISSING)
+        else:
+            self.gold = np.full(n, MISSING, dtype=np.int64)
+            self.soft = np.full((n, truth.max_k), MISSING, dtype=np.int64)
+            self.gold_paths = np.full((n, truth.depth), MISSING, dtype=np.int64)
+        depth = max(truth.depth, max((len(path) for path in paths), default=1))
+        self.predicted_paths = _pad(paths, depth)
+        if depth > truth.depth:
+            pad = np.full((n, depth - truth.depth), MISSING, dtype=np.int64)
+            self.gold_paths = np.hstack([self.gold_paths, pad])
+
+        # rank of the prediction among the gold soft targets (max_k when absent)
+        hits = (self.soft == self.predicted[:, None]) & (self.predicted[:, None] != MISSING)
+        self.rank = np.where(hits.any(axis=1), hits.argmax(axis=1), truth.max_k)
+        self.correct = self.has_truth & (self.predicted == self.gold) & (self.gold != MISSING)
+
+    def __len__(self) -> int:
+        return len(self.predicted)
+
+    def top_k_accuracy(self, mask: np.ndarray | None = None) -> dict[int, float]:
+        """
+        {k: top-k accuracy} for every k in 1..max_k.
+        """
+        rank = self.rank if mask is None else self.rank[mask]
+        if not len(rank):
+            return {k: 0.0 for k in range(1, self.truth.max_k + 1)}
+        cumulative = np.cumsum(np.bincount(rank, minlength=self.truth.max_k + 1))[:self.truth.max_k]
+        return {k: float(hits) / len(rank) for k, hits in enumerate(cumulative, start=1)}
+
+    def accuracy(self, mask: np.ndarray | None = None) -> float:
+        """
+        Share of predictions equal to the gold label.
+        """
+        correct = self.correct if mask is None else self.correct[mask]
+        return float(correct.mean()) if len(correct) else 0.0
+
+    def hierarchical_scores(self, mask: np.ndarray | None = None) -> dict[str, float]:
+        """
+        Path-prefix (hierarchical) precision, recall and F1, micro-averaged.
+
+        The predicted and gold paths are compared from the root: every shared
+        leading label counts as a true positive, so a wrong leaf under the
+        right branch still earns partial credit.
+        """
+        predicted, gold = self.predicted_paths, self.gold_paths
+        if mask is not None:
+            predicted, gold = predicted[mask], gold[mask]
+        same = (predicted == gold) & (predicted != MISSING)
+        shared = np.cumprod(same, axis=1).sum()
+        predicted_len = (predicted != MISSING).sum()
+        gold_len = (gold != MISSING).sum()
+        precision = shared / predicted_len if predicted_len else 0.0
+        recall = shared / gold_len if gold_len else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {"precision": float(precision), "recall": float(recall), "f1": float(f1)}
+
+    def confusion_matrix(self, level=None) -> tuple[list[str | None], np.ndarray]:
+        """
+        Gold x predicted counts over examples with ground truth (optionally one
+        level only). Returns the labels indexing both axes and the matrix; a
+        ground-truth row without a label is counted under None.
+        """
+        mask = self.has_truth & (self.predicted != MISSING)
+        if level is not None:
+            mask &= self.levels == level
+        gold, predicted = self.gold[mask], self.predicted[mask]
+        ids, inverse = np.unique(np.concatenate([gold, predicted]), return_inverse=True)
+        size = len(ids)
+        flat = inverse[:len(gold)] * size + inverse[len(gold):]
+        matrix = np.bincount(flat, minlength=size * size).reshape(size, size)
+        return [self.truth.vocabulary.label(i) for i in ids.tolist()], matrix
+
+    def per_level(self) -> dict:
+        """
+        Count, accuracy, top-k accuracies and hierarchical scores for each level.
+        """
+        report = {}
+        for level in np.unique(self.levels).tolist():
+            mask = self.levels == level
+            report[level] = {
+                "count": int(mask.sum()),
+                "accuracy": self.accuracy(mask),
+                "top_k": self.top_k_accuracy(mask),
+                "hierarchical": self.hierarchical_scores(mask),
+            }
+        return report
+
+    def report(self) -> dict:
+        return {
+            "count": len(self),
+            "with_ground_truth": int(self.has_truth.sum()),
+            "accuracy": self.accuracy(),
+            "top_k": self.top_k_accuracy(),
+            "hierarchical": self.hierarchical_scores(),
+            "per_level": self.per_level(),
+        }
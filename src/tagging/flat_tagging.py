@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import weakref
+
+from src.taxonomy import Taxonomy
+from src.tagging.lexical_index import LexicalIndex
+from src.tagging.response_parser import parse_response, validate_path_candidates
+from llms.client_app import ask_model_plus
+
+PATH_SEPARATOR = " > "
+
+system_prompt = """
+SYSTEM:
+You are an expert intent-tagger. You will be given a document and a short list of candidate category paths, each going from a broad category down to a specific one.
+
+TASK:
+1. Read the document carefully.
+2. For each of your top (at max 3) choices among the candidate paths, provide:
+   • path (copied exactly as given)
+   • confidence
+   • a few sentence rationale **specific to that path only** clearly justifying the choice.
+3. If none of the paths fit then only, Give “None” with a rationale.
+FORMAT:
+```json
+{
+  "candidates": [
+    {
+      "rationale": "…why this path matches this abstract…",
+      "confidence": 0.72,
+      "path":   "<Category1 > Category2 > Category3>"
+    }
+    ...
+  ]
+}
+```"""
+
+user_prompt = """
+Document:
+{document}
+
+
+Candidate category paths.
+{categories}
+"""
+
+# Lexical indexes are built once per taxonomy and reused across calls; held
+# weakly, and rebuilt when `taxonomy.version` shows the tree has changed.
+_indexes: 'weakref.WeakKeyDictionary[Taxonomy, tuple[int, LexicalIndex]]' = weakref.WeakKeyDictionary()
+
+
+def get_leaf_index(taxonomy: Taxonomy) -> LexicalIndex:
+    cached = _indexes.get(taxonomy)
+    if cached is None or cached[0] != taxonomy.version:
+        cached = (taxonomy.version, LexicalIndex.from_taxonomy(taxonomy))
+        _indexes[taxonomy] = cached
+    return cached[1]
+
+
+def _match_path(answer: str, offered: list[tuple[str, ...]]) -> tuple[str, ...] | None:
+    """
+    Map the model's path string back onto one of the offered paths.
+    """
+    answer = (answer or "").strip()
+    by_string = {PATH_SEPARATOR.join(path): path for path in offered}
+    if answer in by_string:
+        return by_string[answer]
+    # tolerate a model that only returned the leaf, or changed the separators
+    parts = tuple(part.strip() for part in answer.replace("→", ">").split(">"))
+    matches = [path for path in offered if path[-1] == parts[-1]]
+    if len(matches) == 1:
+        return matches[0]
+    # a leaf name offered under several parents: only take a path whose
+    # ancestors the answer names, never a guess
+    ancestors = parts[:-1]
+    return next((path for path in matches if ancestors and path[:-1][-len(ancestors):] == ancestors), None)
+
+
+def _nest(ranked: list[tuple[tuple[str, ...], dict]]) -> dict:
+    """
+    Build the nested `tag_n_level` result for the best path. At each level the
+    candidates are the distinct labels proposed at that level by the ranked
+    paths that agree with the best path above it.
+    """
+    best_path, _ = ranked[0]
+    result: dict = {}
+    slot = result
+    for level, label in enumerate(best_path):
+        candidates, seen = [], set()
+        for path, candidate in ranked:
+            if len(path) > level and path[:level] == best_path[:level] and path[level] not in seen:
+                seen.add(path[level])
+                candidates.append({
+                    "label": path[level],
+                    "confidence": candidate.get("confidence", 0),
+                    "rationale": candidate.get("rationale", ""),
+                })
+        top = candidates[0]
+        slot.update({
+            "prediction": label,
+            "rationale": top["rationale"],
+            "confidence": top["confidence"],
+            "candidates": candidates,
+            "children": {}
+        })
+        slot = slot["children"]
+    return result
+
+
+async def tag_flat(
+    document: str,
+    taxonomy: Taxonomy,
+    model: str = "local-qwen3:0.6b",
+    top_n: int = 30,
+    index: LexicalIndex | None = None,
+    semaphore: asyncio.Semaphore | None = None
+) -> dict:
+    """
+    Single-call alternative to `tag_n_level`.
+
+    The full leaf set is first pruned to the `top_n` leaf paths that a local
+    BM25 index (over node names and descriptions) ranks highest for the
+    document, and the model then picks among those full paths in one call.
+
+    Returns:
+        The same nested dict shape as `n_level_tagging.tag_n_level`, following
+        the chosen path down to its leaf.
+    """
+    index = index or get_leaf_index(taxonomy)
+    offered = [path for path, _ in index.search(document, top_n)]
+    if not offered:
+        return {}
+
+    options_str = "\n".join(
+        f"{PATH_SEPARATOR.join(path)} : {node.description if (node := taxonomy.get_node(list(path))) else ''}"
+        for path in offered
+    )
+    prompt = user_prompt.format(document=document, categories=options_str)
+    async with semaphore or contextlib.nullcontext():
+        response = await ask_model_plus(model, prompt, system_prompt, track=True)
+
+    final, _ = parse_response(response, validate=validate_path_candidates)
+    ranked = []
+    for candidate in final.get("candidates", []):
+        path = _match_path(candidate["path"], offered)
+        if path is not None:
+            ranked.append((path, candidate))
+    return _nest(ranked) if ranked else {}
+
+
+if __name__ == "__main__":
+    print(system_prompt)
+    print(user_prompt)
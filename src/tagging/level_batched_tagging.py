@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+
+from src.taxonomy import TaxonomyNode, Taxonomy
+from src.tagging import n_level_tagging, n_level_tagging_simple
+from src.tagging.prompting import PromptTemplate
+from llms.client_app import ask_model_plus
+
+batch_system_prompt = """
+SYSTEM:
+You are an expert intent-tagger. You will be given several documents, each with an id, and a fixed list of allowed categories.
+
+TASK:
+1. Read every document carefully and tag each one independently.
+2. For each document, give your top (at max 3) choices, each with:
+   • label
+   • confidence
+   • a few sentence rationale **specific to that label only** clearly justifying the choice.
+3. If none of the options fit a document then only, Give “None” with a rationale.
+4. Return exactly one entry per document id.
+FORMAT:
+```json
+{
+  "documents": [
+    {
+      "id": "<document id>",
+      "candidates": [
+        {
+          "rationale": "…why Category1 matches this abstract…",
+          "confidence": 0.72,
+          "label":   "<Category1>"
+        }
+        ...
+      ]
+    }
+    ...
+  ]
+}
+```"""
+
+batch_system_prompt_simple = """
+SYSTEM:
+You are an expert intent-tagger. You will be given several documents, each with an id, and a fixed list of allowed categories.
+
+TASK:
+1. Read every document carefully and tag each one independently.
+2. For each document, select the best choice among the categories and provide
+   • label
+   • a few sentence rationale **specific to that label only** clearly justifying the choice.
+3. If none of the options fit a document then only, Give “None” with a rationale.
+4. Return exactly one entry per document id.
+FORMAT:
+```json
+{
+  "documents": [
+    {
+      "id": "<document id>",
+      "rationale": "…why Selected Category matches this abstract…",
+      "label":   "<Category>"
+    }
+    ...
+  ]
+}
+```"""
+
+batch_user_prompt = """
+Documents:
+{documents}
+
+
+Allowed categories.
+{categories}
+"""
+
+document_block = """<document id="{doc_id}">
+{document}
+</document>"""
+
+_batch_template = PromptTemplate(batch_user_prompt)
+_document_template = PromptTemplate(document_block)
+
+STYLES = {
+    # style -> (system prompt, single-document module used for fallbacks and result shape)
+    "candidates": (batch_system_prompt, n_level_tagging),
+    "simple": (batch_system_prompt_simple, n_level_tagging_simple),
+}
+
+
+async def choose_intents_batch(
+    documents: list[str],
+    options: list[TaxonomyNode],
+    model: str = "local-qwen3:0.6b",
+    style: str = "candidates",
+    semaphore: asyncio.Semaphore | None = None,
+    max_tokens_per_document: int = 300
+) -> list[dict]:
+    """
+    Tags several documents against the same option list with a single LLM call.
+
+    Returns one parsed answer per document, in input order. Documents the model
+    left out of its answer (or a response that could not be parsed) are retried
+    one by one with the single-document `choose_intents`.
+    """
+    system, module = STYLES[style]
+    # the category block is rendered once per option list and shared with the single-document prompts
+    options_str = module.STRATEGY.categories.get(options).text
+    documents_str = "\n\n".join(
+        _document_template.render(doc_id=str(i + 1), document=doc.strip())
+        for i, doc in enumerate(documents)
+    )
+    prompt = _batch_template.render(documents=documents_str, categories=options_str)
+
+    async with semaphore or contextlib.nullcontext():
+        response = await ask_model_plus(
+            model, prompt, system, track=True,
+            max_tokens=max_tokens_per_document * len(documents)
+        )
+    final, _ = module.parse_response(response)
+
+    by_id = {}
+    documents_answer = final.get("documents")
+    for entry in documents_answer if isinstance(documents_answer, list) else []:
+        if isinstance(entry, dict) and "id" in entry:
+            # an entry that does not fit the schema is retried like a missing one
+            entry = module.STRATEGY.validate(entry)
+            if entry is not None:
+                by_id[str(entry["id"])] = entry
+
+    answers = [by_id.get(str(i + 1)) for i in range(len(documents))]
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        retried = await asyncio.gather(*[
+            module.choose_intents(documents[i], options, model, semaphore) for i in missing
+        ])
+        for i, (answer, _) in zip(missing, retried):
+            answers[i] = answer
+    return answers
+
+
+async def tag_n_level_batched(
+    documents: list[str],
+    taxonomy: Taxonomy,
+    model: str = "local-qwen3:0.6b",
+    style: str = "candidates",
+    group_size: int = 8,
+    semaphore: asyncio.Semaphore | None = None
+) -> list[dict]:
+    """
+    Level-synchronous variant of `tag_n_level` for many documents at once.
+
+    All documents start at the root. At every level, documents currently sitting
+    at the same taxonomy node are grouped (in chunks of `group_size`) and tagged
+    together in one multi-document prompt, so the category list is sent once per
+    group rather than once per document. A depth-d pass costs roughly
+    (#distinct nodes visited x ceil(docs per node / group_size)) calls instead of
+    (#docs x d).
+
+    Args:
+        documents: The texts (title + abstract) to classify.
+        taxonomy: The Taxonomy object defining the hierarchy.
+        model: The LLM model identifier.
+        style: "candidates" for the `n_level_tagging` output shape (top-3 with
+            confidences) or "simple" for the `n_level_tagging_simple` shape.
+        group_size: Maximum number of documents per LLM call.
+        semaphore: Optional semaphore held around every LLM call.
+
+    Returns:
+        One nested dict per document, in input order, with the same shape the
+        corresponding `tag_n_level` returns.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown style {style!r}, expected one of {sorted(STYLES)}")
+
+    results: list[dict] = [{} for _ in documents]
+    # Each frontier entry maps a node to the documents sitting at it, together with the
+    # dict that the next level's answer for that document must be written into.
+    # Nodes are keyed by value: FrozenTaxonomyNode views are new objects on every
+    # access but compare equal for the same node.
+    frontier: dict[TaxonomyNode, list[tuple[int, dict]]] = {
+        taxonomy.root: [(i, results[i]) for i in range(len(documents))]
+    }
+
+    while frontier:
+        jobs = []
+        for node, members in frontier.items():
+            options = list(node.children.values())
+            for start in range(0, len(members), group_size):
+                jobs.append((options, members[start:start + group_size]))
+
+        answers = await asyncio.gather(*[
+            choose_intents_batch(
+                [documents[i] for i, _ in chunk], options, model, style, semaphore
+            )
+            for options, chunk in jobs
+        ])
+
+        next_frontier: dict[TaxonomyNode, list[tuple[int, dict]]] = {}
+        for (options, chunk), chunk_answers in zip(jobs, answers):
+            for (doc_index, slot), answer in zip(chunk, chunk_answers):
+                result = STYLES[style][1].STRATEGY.to_result(answer or {})
+                if not result:
+                    continue
+                slot.update(result)
+
+                # descend into the chosen child's subtree if available
+                chosen_node = next((opt for opt in options if opt.name == result["prediction"]), None)
+                if chosen_node and chosen_node.children:
+                    next_frontier.setdefault(chosen_node, []).append((doc_index, slot["children"]))
+        frontier = next_frontier
+
+    return results
+
+
+if __name__ == "__main__":
+    print(batch_system_prompt)
+    print(batch_user_prompt)
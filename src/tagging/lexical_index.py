@@ -0,0 +1,83 @@
+import math
+import re
+from collections import Counter
+
+from src.taxonomy import Taxonomy
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Very common words that carry no signal for matching abstracts to categories.
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the
+this these those to was were which with we our their using based via new paper
+approach method methods results show propose proposed also can such other
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 index over taxonomy paths.
+
+    Each entry is a root-to-node path; its text is the node's name and
+    description plus the names of its ancestors, so a query can match a leaf
+    through its branch as well. Postings are precomputed, so a query only
+    touches the entries sharing at least one term with it.
+    """
+
+    def __init__(self, paths: list[tuple[str, ...]], texts: list[str], k1: float = 1.5, b: float = 0.75):
+        self.paths = paths
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths = []
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        n = len(texts)
+        self.idf = {
+            term: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    @classmethod
+    def from_taxonomy(cls, taxonomy: Taxonomy, leaves_only: bool = True, **kwargs) -> 'LexicalIndex':
+        """
+        Index every leaf (or every non-root node) of `taxonomy` by its path.
+        """
+        paths, texts = [], []
+        stack = [(child, (), "") for child in reversed(taxonomy.root.children.values())]
+        while stack:
+            node, parent_path, parent_text = stack.pop()
+            path = parent_path + (node.name,)
+            text = f"{parent_text} {node.name}"
+            if not leaves_only or not node.children:
+                paths.append(path)
+                texts.append(f"{text} {node.description}")
+            stack.extend((child, path, text) for child in reversed(node.children.values()))
+        return cls(paths, texts, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def search(self, query: str, top_n: int = 20) -> list[tuple[tuple[str, ...], float]]:
+        """
+        The `top_n` best-scoring paths for `query`, as (path, score), best first.
+        """
+        scores: dict[int, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in posting:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.k1 + 1) / norm
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_n]
+        return [(self.paths[doc_id], score) for doc_id, score in best]
@@ -1,7 +1,9 @@
-import json
+import asyncio
+from typing import Callable
 
 from src.taxonomy import TaxonomyNode, Taxonomy
-from llms.client_app import ask_model_plus
+from src.tagging import prompting
+from src.tagging.prompting import CandidatesStrategy
 import re
 
 system_prompt = """
@@ -39,21 +41,26 @@ Allowed categories.
 """
 
 
+STRATEGY = CandidatesStrategy(system_prompt, user_prompt)
+
+
 async def choose_intents(
     document: str,
     options: list[TaxonomyNode],
-    model: str = "local-qwen3:0.6b"
+    model: str = "local-qwen3:0.6b",
+    semaphore: asyncio.Semaphore | None = None
 ):
-    formatted_nodes = [f"{opt.name} : {opt.description}" for opt in options]
-    options_str = "\n".join(formatted_nodes)
-    prompt = user_prompt.format(document=document, categories=options_str)
-    response = await ask_model_plus(model, prompt, system_prompt, track=True)
-    return parse_response(response)
+    return await prompting.choose_intents(STRATEGY, document, options, model, semaphore)
 
 async def tag_n_level(
     document: str,
     taxonomy: Taxonomy,
-    model: str = "local-qwen3:0.6b"
+    model: str = "local-qwen3:0.6b",
+    semaphore: asyncio.Semaphore | None = None,
+    resume: list[dict] | None = None,
+    on_level: prompting.LevelCallback | None = None,
+    cascade: prompting.CascadeStage | None = None,
+    raise_errors: bool = False
 ) -> dict:
     """
     Recursively tags an N-level taxonomy for the given document.
@@ -62,6 +69,16 @@ async def tag_n_level(
         document: The text (title + abstract) to classify.
         taxonomy: The Taxonomy object defining the hierarchy (root.children are level-1 options).
         model: The LLM model identifier for choose_intents.
+        semaphore: Optional semaphore held around every LLM call, used to bound
+            concurrency when many documents are tagged at once.
+        resume: Level results already obtained for this document (root level
+            first), reused instead of asking the model again.
+        on_level: Called as on_level(level, parent_path, result) after each
+            level the model decides; used to checkpoint progress.
+        cascade: Optional cheaper decider (e.g. `LocalCascade.decide`) tried
+            before the model at every level.
+        raise_errors: Raise when a model call fails, instead of returning the
+            levels decided so far.
 
     Returns:
         Nested dict:
@@ -69,50 +86,118 @@ async def tag_n_level(
           - candidates: list of {label, confidence, rationale}
           - children: nested dict for the chosen label's subtree (always present, empty if leaf)
     """
-    async def _tag_options(options: list[TaxonomyNode]) -> list[dict]:
-        final, _ = await choose_intents(document, options, model)
-        return final.get("candidates", [])
+    return await prompting.tag_n_level(STRATEGY, document, taxonomy, model, semaphore, resume, on_level, cascade,
+                                       raise_errors)
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def lexical_prior(document: str, node: TaxonomyNode) -> float:
+    """
+    Cheap relevance prior: share of the node's name/description words (longer
+    than 3 characters) that also occur in the document.
+    """
+    doc_words = set(_WORD.findall(document.lower()))
+    node_words = {w for w in _WORD.findall(f"{node.name} {node.description}".lower()) if len(w) > 3}
+    return len(doc_words & node_words) / len(node_words) if node_words else 0.0
+
+
+async def tag_n_level_speculative(
+    document: str,
+    taxonomy: Taxonomy,
+    model: str = "local-qwen3:0.6b",
+    speculate_top_m: int = 2,
+    max_wasted_calls: int = 4,
+    prior: Callable[[str, TaxonomyNode], float] = lexical_prior,
+    semaphore: asyncio.Semaphore | None = None,
+    stats: dict | None = None
+) -> dict:
+    """
+    Same result as `tag_n_level`, but descends speculatively to cut wall-clock time.
 
-    async def _recurse(options: list[TaxonomyNode]) -> dict:
-        candidates = await _tag_options(options)
-        if not options or not candidates:
+    While the call for level k is pending, the level-(k+1) calls for the children
+    of the `speculate_top_m` options ranked highest by `prior` are fired as well.
+    When level k returns, the speculative branch matching the chosen label (if
+    any) is kept and awaited, and the others are cancelled or discarded. On a
+    hit the next level is already in flight or done, so a document costs about
+    one round trip per miss instead of one per level.
+
+    Args:
+        document: The text (title + abstract) to classify.
+        taxonomy: The Taxonomy object defining the hierarchy.
+        model: The LLM model identifier for choose_intents.
+        speculate_top_m: How many branches to start ahead of each decision.
+        max_wasted_calls: Budget of speculative calls that may be thrown away for
+            this document; once spent (or reserved by pending speculation),
+            descent continues without speculating.
+        prior: Scores how likely an option is for the document before the model
+            has answered; defaults to a lexical overlap score.
+        semaphore: Optional semaphore held around every LLM call.
+        stats: Optional dict that receives "calls", "speculative_calls", "hits"
+            and "wasted" counts for this document.
+    """
+    counters = {"calls": 0, "speculative_calls": 0, "hits": 0, "wasted": 0}
+    reserved = 0
+
+    async def _tag_options(options: list[TaxonomyNode]) -> dict:
+        counters["calls"] += 1
+        final, _ = await choose_intents(document, options, model, semaphore)
+        return STRATEGY.to_result(final)
+
+    def _speculate(options: list[TaxonomyNode]) -> dict[str, asyncio.Task]:
+        nonlocal reserved
+        budget = max_wasted_calls - counters["wasted"] - reserved
+        ranked = sorted((opt for opt in options if opt.children),
+                        key=lambda opt: prior(document, opt), reverse=True)
+        branches = {}
+        for opt in ranked[:max(0, min(speculate_top_m, budget))]:
+            task = asyncio.create_task(_tag_options(list(opt.children.values())))
+            # a discarded branch may still fail; don't let that surface as "never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            branches[opt.name] = task
+        reserved += len(branches)
+        counters["speculative_calls"] += len(branches)
+        return branches
+
+    async def _descend(options: list[TaxonomyNode], pending: asyncio.Task) -> dict:
+        nonlocal reserved
+        branches = _speculate(options)
+        try:
+            result = await pending
+        except BaseException:
+            for task in branches.values():
+                task.cancel()
+            raise
+        finally:
+            reserved -= len(branches)
+        top_label = result.get("prediction") if options else None
+
+        # keep the branch that matches the decision, drop the rest
+        for name, task in branches.items():
+            if name != top_label:
+                task.cancel()
+                counters["wasted"] += 1
+        if top_label is None:
             return {}
 
-        top_label = candidates[0]["label"]
-        top_rationale = candidates[0]["rationale"]
-        top_confidence = candidates[0]["confidence"]
-        result = {
-            "prediction": top_label,
-            "rationale": top_rationale,
-            "confidence": top_confidence,
-            "candidates": candidates,
-            "children": {}
-        }
-
-        # descend into the chosen child's subtree if available
         chosen_node = next((opt for opt in options if opt.name == top_label), None)
         if chosen_node and chosen_node.children:
-            result["children"] = await _recurse(
-                list(chosen_node.children.values())
-            )
+            next_task = branches.get(chosen_node.name)
+            if next_task is not None:
+                counters["hits"] += 1
+            else:
+                next_task = asyncio.create_task(_tag_options(list(chosen_node.children.values())))
+            result["children"] = await _descend(list(chosen_node.children.values()), next_task)
         return result
 
-    return await _recurse(list(taxonomy.root.children.values()))
-
-
-def parse_response(response):
-    response_think = extract_text_between('<think>', '</think>', response)
-    response_json = extract_text_between('```json', '```', response)
-    final = {}
+    root_options = list(taxonomy.root.children.values())
     try:
-        final = json.loads(response_json[0]) if response_json else {}
-    except json.decoder.JSONDecodeError:
-        print("Could not parse response as JSON")
-    return final, (response_think[0] if response_think else None)
-
-def extract_text_between(start_delimiter, end_delimiter, text):
-    pattern = re.escape(start_delimiter) + r'(.*?)' + re.escape(end_delimiter)
-    return re.findall(pattern, text, re.DOTALL)
+        return await _descend(root_options, asyncio.create_task(_tag_options(root_options)))
+    finally:
+        if stats is not None:
+            stats.update(counters)
+
 
 if __name__ == "__main__":
     print(system_prompt)
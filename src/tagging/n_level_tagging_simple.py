@@ -1,8 +1,8 @@
-import json
+import asyncio
 
 from src.taxonomy import TaxonomyNode, Taxonomy
-from llms.client_app import ask_model_plus
-import re
+from src.tagging import prompting
+from src.tagging.prompting import SingleChoiceStrategy
 
 system_prompt = """
 SYSTEM:
@@ -32,21 +32,26 @@ Allowed categories.
 """
 
 
+STRATEGY = SingleChoiceStrategy(system_prompt, user_prompt)
+
+
 async def choose_intents(
     document: str,
     options: list[TaxonomyNode],
-    model: str = "local-qwen3:0.6b"
+    model: str = "local-qwen3:0.6b",
+    semaphore: asyncio.Semaphore | None = None
 ):
-    formatted_nodes = [f"{opt.name} : {opt.description}" for opt in options]
-    options_str = "\n".join(formatted_nodes)
-    prompt = user_prompt.format(document=document, categories=options_str)
-    response = await ask_model_plus(model, prompt, system_prompt, track=True)
-    return parse_response(response)
+    return await prompting.choose_intents(STRATEGY, document, options, model, semaphore)
 
 async def tag_n_level(
     document: str,
     taxonomy: Taxonomy,
-    model: str = "local-qwen3:0.6b"
+    model: str = "local-qwen3:0.6b",
+    semaphore: asyncio.Semaphore | None = None,
+    resume: list[dict] | None = None,
+    on_level: prompting.LevelCallback | None = None,
+    cascade: prompting.CascadeStage | None = None,
+    raise_errors: bool = False
 ) -> dict:
     """
     Recursively tags an N-level taxonomy for the given document.
@@ -55,54 +60,26 @@ async def tag_n_level(
         document: The text (title + abstract) to classify.
         taxonomy: The Taxonomy object defining the hierarchy (root.children are level-1 options).
         model: The LLM model identifier for choose_intents.
+        semaphore: Optional semaphore held around every LLM call, used to bound
+            concurrency when many documents are tagged at once.
+        resume: Level results already obtained for this document (root level
+            first), reused instead of asking the model again.
+        on_level: Called as on_level(level, parent_path, result) after each
+            level the model decides; used to checkpoint progress.
+        cascade: Optional cheaper decider (e.g. `LocalCascade.decide`) tried
+            before the model at every level.
+        raise_errors: Raise when a model call fails, instead of returning the
+            levels decided so far.
 
     Returns:
         Nested dict:
-          - prediction: top label
-          - candidates: list of {label, confidence, rationale}
+          - prediction: chosen label
+          - rationale: the model's justification
           - children: nested dict for the chosen label's subtree (always present, empty if leaf)
     """
-    async def _tag_options(options: list[TaxonomyNode]) -> dict:
-        final, _ = await choose_intents(document, options, model)
-        return final
-
-    async def _recurse(options: list[TaxonomyNode]) -> dict:
-        choice = await _tag_options(options)
-        if not options or not choice:
-            return {}
-
-        label = choice["label"]
-        rationale = choice["rationale"]
-        result = {
-            "prediction": label,
-            "rationale": rationale,
-            "children": {}
-        }
-
-        # descend into the chosen child's subtree if available
-        chosen_node = next((opt for opt in options if opt.name == label), None)
-        if chosen_node and chosen_node.children:
-            result["children"] = await _recurse(
-                list(chosen_node.children.values())
-            )
-        return result
-
-    return await _recurse(list(taxonomy.root.children.values()))
-
-
-def parse_response(response):
-    response_think = extract_text_between('<think>', '</think>', response)
-    response_json = extract_text_between('```json', '```', response)
-    final = {}
-    try:
-        final = json.loads(response_json[0]) if response_json else {}
-    except json.decoder.JSONDecodeError:
-        print("Could not parse response as JSON")
-    return final, (response_think[0] if response_think else None)
+    return await prompting.tag_n_level(STRATEGY, document, taxonomy, model, semaphore, resume, on_level, cascade,
+                                       raise_errors)
 
-def extract_text_between(start_delimiter, end_delimiter, text):
-    pattern = re.escape(start_delimiter) + r'(.*?)' + re.escape(end_delimiter)
-    return re.findall(pattern, text, re.DOTALL)
 
 if __name__ == "__main__":
     print(system_prompt)
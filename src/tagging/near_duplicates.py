@@ -0,0 +1,180 @@
+import json
+import os
+import zlib
+from collections import Counter
+from typing import Any, Callable
+
+import numpy as np
+
+from src.tagging.lexical_index import tokenize
+
+# Prime just above 2**32: with multipliers below 2**31 and 32-bit shingle
+# hashes, a * x + b stays inside uint64.
+_PRIME = np.uint64(4294967311)
+
+
+def shingles(text: str, k: int = 3) -> np.ndarray:
+    """
+    Hashes of the word k-grams of the normalised text (lower-cased, stopwords
+    dropped, as in the lexical index), so formatting and punctuation changes
+    between versions of a paper do not count as differences.
+    """
+    tokens = tokenize(text)
+    if len(tokens) < k:
+        grams = {" ".join(tokens)} if tokens else set()
+    else:
+        grams = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of tagged documents with LSH banding, mapping each
+    document key to a stored value (its tagging result).
+
+    `match(text)` estimates the Jaccard similarity of the text's shingles to
+    every document sharing at least one LSH band with it and returns the most
+    similar (key, value, similarity), or None below `min_similarity`. With
+    `bands` x `rows` = `num_perm`, pairs above roughly (1/bands)**(1/rows)
+    similarity are found with high probability; the defaults (16 x 8) suit
+    thresholds from about 0.7 up.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, seed: int = 108):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.keys: list = []
+        self.values: list = []
+        self.signatures: list[np.ndarray] = []
+        self._positions: dict[Any, int] = {}
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    def signature(self, text: str) -> np.ndarray | None:
+        hashes = shingles(text)
+        if not len(hashes):
+            return None
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, key, value, signature: np.ndarray) -> None:
+        position = len(self.keys)
+        self._positions[key] = position
+        self.keys.append(key)
+        self.values.append(value)
+        self.signatures.append(signature)
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(band_key, []).append(position)
+
+    def add(self, key, text: str, value) -> bool:
+        """
+        Index `text` under `key`. Returns False (and indexes nothing) for
+        texts without shingles or keys already present.
+        """
+        if key in self._positions:
+            return False
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        self._insert(key, value, signature)
+        return True
+
+    def match(self, text: str, min_similarity: float) -> tuple[Any, Any, float] | None:
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(band.get(band_key, ()))
+        best, best_similarity = None, min_similarity
+        for position in candidates:
+            similarity = float(np.mean(self.signatures[position] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = position, similarity
+        if best is None:
+            return None
+        return self.keys[best], self.values[best], best_similarity
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to `path` (.npz); values must be JSON-serialisable.
+        """
+        meta = {"num_perm": self.num_perm, "bands": self.bands, "seed": self.seed,
+                "keys": self.keys, "values": self.values}
+        signatures = np.stack(self.signatures) if self.signatures else np.zeros((0, self.num_perm), dtype=np.uint64)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, meta=np.array(json.dumps(meta, ensure_ascii=False)), signatures=signatures)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'NearDuplicateIndex':
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            signatures = data["signatures"]
+        index = cls(meta["num_perm"], meta["bands"], meta["seed"])
+        for key, value, signature in zip(meta["keys"], meta["values"], signatures):
+            index._insert(key, value, signature)
+        return index
+
+
+class DuplicateReuse:
+    """
+    Decides how much of a near-duplicate's result a new document may reuse:
+    the whole tagging result at `full_threshold` similarity or above, only
+    the level-1 decision (as a `resume` prefix) at `level1_threshold` or
+    above, nothing otherwise. Outcomes are counted in `stats`.
+
+    `accept(response)` tells finished results from partial trees left by
+    failed calls: only accepted results are indexed, and an indexed result
+    that is not accepted (e.g. from an index saved by an older run) lends at
+    most its level-1 decision.
+    """
+
+    def __init__(self, index: NearDuplicateIndex, full_threshold: float = 0.9, level1_threshold: float = 0.7,
+                 accept: Callable[[dict], bool] | None = None):
+        self.index = index
+        self.full_threshold = full_threshold
+        self.level1_threshold = level1_threshold
+        self.accept = accept
+        self.stats: Counter = Counter()
+
+    def _accepted(self, response) -> bool:
+        return bool(response) and (self.accept is None or self.accept(response))
+
+    def lookup(self, text: str) -> tuple[dict | None, list[dict] | None]:
+        """
+        Returns (response to reuse, resume prefix); at most one is set.
+        """
+        found = self.index.match(text, self.level1_threshold) if len(self.index) else None
+        if found is None:
+            self.stats["miss"] += 1
+            return None, None
+        _, response, similarity = found
+        if similarity >= self.full_threshold and self._accepted(response):
+            self.stats["full"] += 1
+            return response, None
+        if not isinstance(response, dict) or not response.get("prediction"):
+            self.stats["miss"] += 1
+            return None, None
+        self.stats["level1"] += 1
+        return None, [{k: v for k, v in response.items() if k != "children"}]
+
+    def add(self, key, text: str, response: dict) -> bool:
+        """
+        Index an accepted result; returns whether it was indexed.
+        """
+        return self._accepted(response) and self.index.add(key, text, response)
@@ -0,0 +1,307 @@
+import asyncio
+import contextlib
+import operator
+import re
+import string
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from src.taxonomy import TaxonomyNode, Taxonomy
+from src.tagging.response_parser import Validator, parse_response, validate_candidates, validate_single_choice
+from llms.client_app import ask_model_plus
+from llms.tracing import tracer
+
+# Rough prompt-size heuristic, the same starting point the rate limiter uses.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class PromptTemplate:
+    """
+    A `str.format` template parsed once into literal and field parts.
+
+    `render` only concatenates, and `bind` substitutes some fields up front so
+    that a template with a fixed category block can be rendered for many
+    documents by joining three strings.
+    """
+
+    def __init__(self, template: str):
+        self.parts: list[tuple[str, str | None]] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(template)
+        ]
+        self.literal_chars = sum(len(literal) for literal, _ in self.parts)
+
+    @classmethod
+    def _from_parts(cls, parts: list[tuple[str, str | None]]) -> 'PromptTemplate':
+        template = cls.__new__(cls)
+        # merge adjacent literals so rendering touches as few pieces as possible
+        merged: list[tuple[str, str | None]] = []
+        for literal, field in parts:
+            if merged and merged[-1][1] is None:
+                literal = merged.pop()[0] + literal
+            merged.append((literal, field))
+        template.parts = merged
+        template.literal_chars = sum(len(literal) for literal, _ in merged)
+        return template
+
+    @property
+    def fields(self) -> list[str]:
+        return [field for _, field in self.parts if field is not None]
+
+    def bind(self, **fields: str) -> 'PromptTemplate':
+        """
+        Return a template with `fields` already substituted.
+        """
+        parts = []
+        for literal, field in self.parts:
+            if field in fields:
+                parts.append((literal + fields[field], None))
+            else:
+                parts.append((literal, field))
+        return self._from_parts(parts)
+
+    def render(self, **fields: str) -> str:
+        if len(self.parts) == 2 and self.parts[1][1] is None:
+            # the common bound case: prefix + {field} + suffix
+            (prefix, field), (suffix, _) = self.parts
+            return prefix + fields[field] + suffix
+        pieces = []
+        for literal, field in self.parts:
+            pieces.append(literal)
+            if field is not None:
+                pieces.append(fields[field])
+        return "".join(pieces)
+
+
+@dataclass(frozen=True)
+class CategoryBlock:
+    text: str
+    tokens: int
+    # the user template with this block bound, ready for `render(document=...)`
+    template: PromptTemplate
+
+
+_stamp = operator.attrgetter("name", "description")
+
+
+class CategoryBlockCache:
+    """
+    Rendered "name : description" blocks, keyed by the option list itself.
+
+    Option lists are the children of one taxonomy node, so in practice there is
+    one entry per internal node. `TaxonomyNode`s hash by identity and
+    `FrozenTaxonomyNode` views by (taxonomy, index), so the fresh views a frozen
+    taxonomy hands out on every access still hit. An entry is reused only while
+    every option still has the same name and description, so adding children
+    (a new option list), rebuilding the taxonomy or editing a node in place all
+    invalidate it without any explicit hook.
+    """
+
+    def __init__(self, template: PromptTemplate, max_entries: int = 4096):
+        self.template = template
+        self.max_entries = max_entries
+        self._entries: dict[tuple, tuple[tuple, CategoryBlock]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, options: list[TaxonomyNode]) -> CategoryBlock:
+        key = tuple(options)
+        stamp = tuple(map(_stamp, options))
+        entry = self._entries.get(key)
+        # the key keeps the nodes alive; the stamp catches in-place edits of
+        # names/descriptions
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        text = "\n".join(f"{opt.name} : {opt.description}" for opt in options)
+        block = CategoryBlock(text, estimate_tokens(text), self.template.bind(categories=text))
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+        self._entries[key] = (stamp, block)
+        return block
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def extract_text_between(start_delimiter, end_delimiter, text):
+    pattern = re.escape(start_delimiter) + r'(.*?)' + re.escape(end_delimiter)
+    return re.findall(pattern, text, re.DOTALL)
+
+
+class PromptStrategy:
+    """
+    Everything that differs between the tagger flavours: the prompts, and how a
+    parsed answer becomes the per-level result dict. Rendering, the LLM call
+    and the descent are shared (`choose_intents`, `tag_n_level` below).
+    """
+
+    # normalises a parsed answer to the strategy's schema, or rejects it (None)
+    validate: Validator | None = None
+
+    def __init__(self, system_prompt: str, user_prompt: str):
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.system_tokens = estimate_tokens(system_prompt)
+        self.categories = CategoryBlockCache(PromptTemplate(user_prompt))
+
+    def render(self, document: str, options: list[TaxonomyNode]) -> str:
+        return self.categories.get(options).template.render(document=document)
+
+    def render_batch(self, documents: list[str], options: list[TaxonomyNode]) -> list[str]:
+        """
+        User prompts for several documents against the same option list.
+        """
+        template = self.categories.get(options).template
+        return [template.render(document=document) for document in documents]
+
+    def estimate_tokens(self, document: str, options: list[TaxonomyNode]) -> int:
+        """
+        Approximate prompt tokens (system + user) for one call.
+        """
+        block = self.categories.get(options)
+        return self.system_tokens + estimate_tokens(document) + -(-block.template.literal_chars // CHARS_PER_TOKEN)
+
+    def parse(self, response):
+        return parse_response(response, validate=self.validate)
+
+    def to_result(self, final: dict) -> dict:
+        """
+        Turn a parsed answer into {"prediction", "rationale", ..., "children": {}},
+        or {} when the answer holds no usable choice.
+        """
+        raise NotImplementedError
+
+
+class CandidatesStrategy(PromptStrategy):
+    """
+    Top-3 answers with confidences: {"candidates": [{label, confidence, rationale}]}.
+    """
+
+    validate = staticmethod(validate_candidates)
+
+    def to_result(self, final: dict) -> dict:
+        candidates = final.get("candidates", [])
+        if not candidates:
+            return {}
+        return {
+            "prediction": candidates[0]["label"],
+            "rationale": candidates[0]["rationale"],
+            "confidence": candidates[0]["confidence"],
+            "candidates": candidates,
+            "children": {}
+        }
+
+
+class SingleChoiceStrategy(PromptStrategy):
+    """
+    One answer: {"label", "rationale"}.
+    """
+
+    validate = staticmethod(validate_single_choice)
+
+    def to_result(self, final: dict) -> dict:
+        if not final.get("label"):
+            return {}
+        return {
+            "prediction": final["label"],
+            "rationale": final.get("rationale"),
+            "children": {}
+        }
+
+
+async def choose_intents(
+    strategy: PromptStrategy,
+    document: str,
+    options: list[TaxonomyNode],
+    model: str = "local-qwen3:0.6b",
+    semaphore: asyncio.Semaphore | None = None,
+    raise_errors: bool = False
+):
+    with tracer.span("choose_intents") as span:
+        started = time.perf_counter()
+        prompt = strategy.render(document, options)
+        queued = time.perf_counter()
+        span.set(options=len(options), prompt_chars=len(prompt))
+        span.time("render", queued - started)
+        # The semaphore is shared by every document of a batch run, so it bounds
+        # the number of in-flight LLM calls rather than the number of documents.
+        async with semaphore or contextlib.nullcontext():
+            span.time("queue_wait", time.perf_counter() - queued)
+            response = await ask_model_plus(model, prompt, strategy.system_prompt, track=True,
+                                            raise_errors=raise_errors)
+        parsing = time.perf_counter()
+        parsed = strategy.parse(response)
+        span.time("parse", time.perf_counter() - parsing)
+        if not parsed[0]:
+            span.count("parse_failures")
+        return parsed
+
+
+LevelCallback = Callable[[int, list[str], dict], None]
+# (document, options, parent_path) -> a level result, or None to ask the model
+CascadeStage = Callable[[str, list[TaxonomyNode], list[str]], dict | None]
+
+
+async def tag_n_level(
+    strategy: PromptStrategy,
+    document: str,
+    taxonomy: Taxonomy,
+    model: str = "local-qwen3:0.6b",
+    semaphore: asyncio.Semaphore | None = None,
+    resume: list[dict] | None = None,
+    on_level: LevelCallback | None = None,
+    cascade: CascadeStage | None = None,
+    raise_errors: bool = False
+) -> dict:
+    """
+    Level-by-level descent shared by `n_level_tagging` and `n_level_tagging_simple`.
+
+    `resume` holds level results (without "children") already obtained for
+    this document, root level first; they are reused instead of calling the
+    model as long as each still names one of the options. `on_level(level,
+    parent_path, result)` is called after every fresh model decision, so a
+    caller can persist progress as it is made. `cascade` is asked first at
+    every level (e.g. `LocalCascade.decide`); the model is only called when
+    it returns None. With `raise_errors`, a failed model call raises instead
+    of ending the descent as if the model had given no usable answer.
+    """
+    async def _recurse(options: list[TaxonomyNode], level: int, parent_path: list[str]) -> dict:
+        if not options:
+            return {}
+        # one span per decision; closed before descending so levels do not nest
+        with tracer.span("tag_level", level=level) as span:
+            span.set(parent=parent_path[-1] if parent_path else None, options=len(options))
+            known = resume[level - 1] if resume and len(resume) >= level else None
+            if known and any(opt.name == known.get("prediction") for opt in options):
+                result = {**known, "children": {}}
+                span.count("resumed")
+            else:
+                result = cascade(document, options, parent_path) if cascade is not None else None
+                if result:
+                    span.count("cascaded")
+                else:
+                    final, _ = await choose_intents(strategy, document, options, model, semaphore, raise_errors)
+                    result = strategy.to_result(final)
+                if not result:
+                    span.count("undecided")
+                    return {}
+                if on_level is not None:
+                    on_level(level, parent_path, {k: v for k, v in result.items() if k != "children"})
+
+        # descend into the chosen child's subtree if available
+        chosen_node = next((opt for opt in options if opt.name == result["prediction"]), None)
+        if chosen_node and chosen_node.children:
+            result["children"] = await _recurse(
+                list(chosen_node.children.values()), level + 1, parent_path + [chosen_node.name]
+            )
+        return result
+
+    with tracer.span("tag_document", strategy=type(strategy).__name__):
+        return await _recurse(list(taxonomy.root.children.values()), 1, [])
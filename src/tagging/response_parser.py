@@ -0,0 +1,264 @@
+import json
+import re
+from collections import Counter
+from typing import Callable
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# Structural characters that matter outside / inside a JSON string.
+_STRUCTURE = re.compile(r'[{}\[\]",\\]')
+_IN_STRING = re.compile(r'["\\]')
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+# Parse outcomes since start-up (or the last `parse_stats.clear()`), by cause:
+# "ok", "repaired_trailing_comma", "repaired_truncated", "empty", "no_json",
+# "invalid_json", "truncated", "schema".
+parse_stats: Counter = Counter()
+
+Validator = Callable[[dict], dict | None]
+
+
+def _clean_candidates(final: dict, key: str) -> dict | None:
+    candidates = final.get("candidates") if isinstance(final, dict) else None
+    if not isinstance(candidates, list):
+        return None
+    cleaned = []
+    for candidate in candidates:
+        if not isinstance(candidate, dict) or not isinstance(candidate.get(key), str) or not candidate[key]:
+            continue
+        try:
+            confidence = float(candidate.get("confidence", 0) or 0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        cleaned.append({
+            **candidate,
+            "confidence": confidence,
+            "rationale": str(candidate.get("rationale") or ""),
+        })
+    return {**final, "candidates": cleaned} if cleaned else None
+
+
+def validate_candidates(final: dict) -> dict | None:
+    """
+    Schema of `n_level_tagging`: {"candidates": [{label, confidence, rationale}]}.
+    Candidates without a label are dropped and missing fields get defaults;
+    returns None when no candidate is left.
+    """
+    return _clean_candidates(final, "label")
+
+
+def validate_path_candidates(final: dict) -> dict | None:
+    """
+    Schema of `flat_tagging`: {"candidates": [{path, confidence, rationale}]},
+    cleaned like `validate_candidates` but keyed on a non-empty string path.
+    """
+    return _clean_candidates(final, "path")
+
+
+def validate_single_choice(final: dict) -> dict | None:
+    """
+    Schema of `n_level_tagging_simple`: {"label", "rationale"}.
+    """
+    if not isinstance(final, dict) or not isinstance(final.get("label"), str) or not final["label"]:
+        return None
+    return {**final, "rationale": str(final.get("rationale") or "")}
+
+
+class ResponseParser:
+    """
+    Incremental extractor for the first JSON object in an LLM response.
+
+    Feed it the response in chunks (e.g. as `on_token` of a streamed
+    `ask_model_plus` call) or all at once. `<think>...</think>` blocks are
+    skipped without being buffered, and the first balanced `{...}` is taken
+    whether or not it sits in a ```json fence. Text that is not part of a
+    candidate object is discarded as it is scanned, so memory stays bounded by
+    the size of the object itself.
+
+    With repair=True, trailing commas are removed and an object cut off by the
+    end of the stream is closed at the last complete value. An optional
+    `validate` callable normalises the parsed object or rejects it (None).
+    Call `close()` after the last chunk to get the result; outcomes are counted
+    in the module-level `parse_stats`.
+    """
+
+    def __init__(self, repair: bool = True, validate: Validator | None = None, keep_think: bool = False):
+        self.repair = repair
+        self.validate = validate
+        self.keep_think = keep_think
+        self.result: dict | None = None
+        self.cause: str | None = None
+        self.think: str | None = None
+        self._think_parts: list[str] | None = [] if keep_think else None
+        self._in_think = False
+        self._pending = ""      # unconsumed text: a partial tag, or the object being read
+        self._scan = 0          # where scanning resumes inside `_pending`
+        self._stack = ""        # open brackets of the current object, e.g. "{[{"
+        self._in_string = False
+        self._cuts: list[tuple[int, str]] = []  # (offset of a top-level-safe comma, stack there)
+        self._saw_text = False
+        self._invalid = False
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consume a chunk. Returns True once an object has been parsed; later
+        chunks are ignored.
+        """
+        if self.done or not chunk:
+            return self.done
+        self._saw_text = self._saw_text or not chunk.isspace()
+        buf = self._pending + chunk
+        pos = self._scan
+        while True:
+            if self._in_think:
+                end = buf.find(THINK_CLOSE, pos)
+                if end < 0:
+                    # keep just enough to recognise a closing tag split across chunks
+                    keep = max(pos, len(buf) - len(THINK_CLOSE) + 1)
+                    if self._think_parts is not None:
+                        self._think_parts.append(buf[pos:keep])
+                    self._pending, self._scan = buf[keep:], 0
+                    return False
+                if self._think_parts is not None:
+                    self._think_parts.append(buf[pos:end])
+                    self.think = "".join(self._think_parts)
+                    self._think_parts = []
+                self._in_think = False
+                pos = end + len(THINK_CLOSE)
+            elif not self._stack:
+                brace = buf.find("{", pos)
+                think = buf.find(THINK_OPEN, pos, brace if brace >= 0 else len(buf))
+                if think >= 0:
+                    self._in_think = True
+                    pos = think + len(THINK_OPEN)
+                elif brace >= 0:
+                    buf, pos = buf[brace:], 1
+                    self._stack, self._in_string, self._cuts = "{", False, []
+                else:
+                    keep = max(pos, len(buf) - len(THINK_OPEN) + 1)
+                    self._pending, self._scan = buf[keep:], 0
+                    return False
+            else:
+                end = self._scan_object(buf, pos)
+                if end < 0:
+                    self._pending, self._scan = buf, -end - 1
+                    return False
+                if self._accept(buf[:end]):
+                    self._pending, self._scan = "", 0
+                    return True
+                self._invalid = True
+                pos = end
+
+    def _scan_object(self, buf: str, pos: int) -> int:
+        """
+        Advance through the current object; returns the offset just past its
+        closing brace, or, if the buffer ends first, -(resume offset + 1).
+        """
+        stack, in_string = self._stack, self._in_string
+        while True:
+            match = (_IN_STRING if in_string else _STRUCTURE).search(buf, pos)
+            if match is None:
+                self._stack, self._in_string = stack, in_string
+                return -len(buf) - 1
+            ch = match.group()
+            pos = match.end()
+            if ch == "\\":
+                if pos >= len(buf):
+                    # the escaped character is in the next chunk: rescan the backslash then
+                    self._stack, self._in_string = stack, in_string
+                    return -(pos - 1) - 1
+                pos += 1
+            elif ch == '"':
+                in_string = not in_string
+            elif ch in "{[":
+                stack += ch
+            elif ch in "}]":
+                stack = stack[:-1]
+                if not stack:
+                    self._stack, self._in_string = stack, False
+                    return pos
+            else:  # ","
+                self._cuts.append((pos - 1, stack))
+
+    def _accept(self, text: str, truncated: bool = False) -> bool:
+        try:
+            final, cause = json.loads(text), "ok"
+        except json.JSONDecodeError:
+            if not self.repair:
+                return False
+            try:
+                final, cause = json.loads(_TRAILING_COMMA.sub(r"\1", text)), "repaired_trailing_comma"
+            except json.JSONDecodeError:
+                return False
+        if not isinstance(final, dict):
+            return False
+        if self.validate is not None:
+            final = self.validate(final)
+            if final is None:
+                self.cause = "schema"
+                return False
+        self.result = final
+        self.cause = "repaired_truncated" if truncated else cause
+        return True
+
+    def _repair_truncated(self) -> bool:
+        """
+        Close an object cut off by the end of the stream: first as-is (closing
+        an open string), then at each earlier comma, most recent first.
+        """
+        text = self._pending
+        attempts = []
+        head = text + ('"' if self._in_string else "")
+        attempts.append((re.sub(r"[\s,:]+$", "", head), self._stack))
+        for offset, stack in reversed(self._cuts):
+            attempts.append((text[:offset], stack))
+        for body, stack in attempts:
+            closers = "".join("}" if ch == "{" else "]" for ch in reversed(stack))
+            if self._accept(body + closers, truncated=True):
+                return True
+        return False
+
+    def close(self) -> tuple[dict, str | None]:
+        """
+        Finish parsing and return (parsed object or {}, think text if kept).
+        """
+        if not self.done:
+            if self._stack and self.repair and self._repair_truncated():
+                pass
+            elif self.cause != "schema":
+                if self._stack:
+                    self.cause = "truncated"
+                elif self._invalid:
+                    self.cause = "invalid_json"
+                elif not self._saw_text:
+                    self.cause = "empty"
+                else:
+                    self.cause = "no_json"
+        if self._in_think and self._think_parts is not None:
+            # an unterminated think block: keep what was seen
+            self._think_parts.append(self._pending)
+            self.think = "".join(self._think_parts)
+        parse_stats[self.cause] += 1
+        if not self.done:
+            print(f"Could not parse response as JSON ({self.cause})")
+        return (self.result or {}), self.think
+
+
+def parse_response(
+    response: str | None,
+    validate: Validator | None = None,
+    repair: bool = True,
+    keep_think: bool = True
+) -> tuple[dict, str | None]:
+    """
+    Parse a complete response; see `ResponseParser`. A None response (a failed
+    call) counts as "empty".
+    """
+    parser = ResponseParser(repair=repair, validate=validate, keep_think=keep_think)
+    parser.feed(response or "")
+    return parser.close()
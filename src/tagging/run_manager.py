@@ -0,0 +1,297 @@
+import copy
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+
+from src.dataset.formatting import dblp_format
+from src.taxonomy import Taxonomy
+from src.tagging.batch_tagging import Tagger, tag_batch
+from src.tagging.n_level_tagging import tag_n_level
+from src.tagging.near_duplicates import DuplicateReuse, NearDuplicateIndex
+
+
+class RunJournal:
+    """
+    Append-only JSONL checkpoint of a tagging run.
+
+    Four kinds of entries are written:
+      {"type": "level", "id", "level", "parent_path", "result"}  one model decision
+      {"type": "done", "id", "example", "response"}              a finished document
+      {"type": "stopped", "id", "example", "response"}           a descent the model ended early
+      {"type": "error", "id", "error"}                          a failed attempt
+    Opening an existing journal replays it: finished and stopped ids are
+    remembered (their responses stay on disk) and level entries of unfinished
+    documents are kept so they can be resumed. A line torn by a crash is cut
+    off before appending.
+    """
+
+    def __init__(self, path: str, durable: bool = False):
+        self.path = path
+        self.durable = durable
+        self.completed: set = set()
+        # terminal like `completed`, but the response ends above the leaves
+        self.stopped: set = set()
+        self.partial: dict[Any, list[dict]] = {}
+        self.failed = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                good += len(line)
+                self._apply(entry)
+        if good < os.path.getsize(self.path):
+            print(f"--- Dropping a torn entry at the end of {self.path} ---")
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+
+    def _apply(self, entry: dict) -> None:
+        key = entry.get("id")
+        if entry.get("type") == "done":
+            self.completed.add(key)
+            self.stopped.discard(key)
+            self.partial.pop(key, None)
+        elif entry.get("type") == "stopped" and key not in self.completed:
+            self.stopped.add(key)
+            self.partial.pop(key, None)
+        elif entry.get("type") == "level" and key not in self.completed and key not in self.stopped:
+            levels = self.partial.setdefault(key, [])
+            level = entry["level"]
+            # a re-decided level invalidates everything recorded below it
+            del levels[level - 1:]
+            if len(levels) == level - 1:
+                levels.append(entry["result"])
+
+    def _append(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
+
+    def record_level(self, key, level: int, parent_path: list[str], result: dict) -> None:
+        entry = {"type": "level", "id": key, "level": level, "parent_path": parent_path, "result": result}
+        self._apply(entry)
+        self._append(entry)
+
+    def record_done(self, key, example: dict, response: dict) -> None:
+        entry = {"type": "done", "id": key, "example": example, "response": response}
+        self._apply(entry)
+        self._append(entry)
+
+    def record_stopped(self, key, example: dict, response: dict) -> None:
+        entry = {"type": "stopped", "id": key, "example": example, "response": response}
+        self._apply(entry)
+        self._append(entry)
+
+    def record_error(self, key, error: str) -> None:
+        # informational only: the document stays unfinished and its level
+        # entries are kept, so the next run resumes it
+        self.failed += 1
+        self._append({"type": "error", "id": key, "error": error})
+
+    def records(self, kind: str = "done") -> Iterator[dict]:
+        """
+        Finished (or, with kind="stopped", stopped) documents as {"id",
+        "example", "response"}, in the order they were recorded.
+        """
+        self._file.flush()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("type") == kind:
+                    yield {"id": entry["id"], "example": entry["example"], "response": entry["response"]}
+
+    def compact(self) -> None:
+        """
+        Rewrite the journal keeping only finished and stopped documents and
+        the level entries of unfinished ones.
+        """
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as out:
+            for kind in ("done", "stopped"):
+                for record in self.records(kind):
+                    if kind == "stopped" and record["id"] in self.completed:
+                        continue
+                    out.write(json.dumps({"type": kind, **record}, ensure_ascii=False) + "\n")
+            for key, levels in self.partial.items():
+                parent_path: list[str] = []
+                for level, result in enumerate(levels, start=1):
+                    entry = {"type": "level", "id": key, "level": level, "parent_path": list(parent_path), "result": result}
+                    out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    parent_path.append(result["prediction"])
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'RunJournal':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def is_complete(response: dict | None, taxonomy: Taxonomy) -> bool:
+    """
+    Whether `response` follows its `prediction`/`children` chain from the
+    root down to a leaf. A model answer with no usable or an off-list label
+    ends the chain early, leaving a partial tree.
+    """
+    node = taxonomy.root
+    while node.children:
+        if not isinstance(response, dict) or not response.get("prediction"):
+            return False
+        node = node.get_child(response["prediction"])
+        if node is None:
+            return False
+        response = response.get("children")
+    return True
+
+
+class TaggingRun:
+    """
+    Resumable `tag_batch` run over a dataset, checkpointed to a `RunJournal`.
+
+    Every model decision and every finished document is appended to the
+    journal as it happens. Running again with the same journal skips finished
+    ids and restarts unfinished documents from their last recorded level, so
+    a crash or kernel restart only loses the calls that were in flight.
+
+    A failed model call (transport error, retries exhausted) fails the
+    document, which the next run retries. A descent the model itself ends
+    above the leaves (answering "None", an off-list label, or an answer the
+    schema rejects) is recorded as stopped and not sent again.
+
+    Args:
+        journal_path: Where the checkpoint journal lives.
+        taxonomy: The Taxonomy to tag against.
+        model: The LLM model identifier.
+        tagger: A tagger accepting `resume`, `on_level` and `raise_errors`, i.e.
+            `n_level_tagging.tag_n_level` or `n_level_tagging_simple.tag_n_level`.
+        formatter: Turns an example into the document text.
+        id_field: Key holding the example id.
+        durable: fsync the journal after every entry.
+        reuse_duplicates: Reuse the results of near-duplicate documents
+            (MinHash/LSH over the formatted text, see `DuplicateReuse`): the
+            whole result at `full_threshold` similarity, the level-1 decision
+            at `level1_threshold`. The index is kept next to the journal
+            (`<journal>.minhash.npz`), so reuse carries across runs.
+    """
+
+    def __init__(
+        self,
+        journal_path: str,
+        taxonomy: Taxonomy,
+        model: str = "local-qwen3:0.6b",
+        tagger: Tagger = tag_n_level,
+        formatter: Callable[[dict], str] = dblp_format,
+        id_field: str = "id",
+        durable: bool = False,
+        reuse_duplicates: bool = False,
+        full_threshold: float = 0.9,
+        level1_threshold: float = 0.7,
+    ):
+        self.journal = RunJournal(journal_path, durable=durable)
+        self.taxonomy = taxonomy
+        self.model = model
+        self.tagger = tagger
+        self.formatter = formatter
+        self.id_field = id_field
+        self.duplicates: DuplicateReuse | None = None
+        self.index_path = journal_path + ".minhash.npz"
+        if reuse_duplicates:
+            self.duplicates = DuplicateReuse(
+                NearDuplicateIndex.load(self.index_path) if os.path.exists(self.index_path) else NearDuplicateIndex(),
+                full_threshold, level1_threshold,
+                accept=lambda response: is_complete(response, taxonomy)
+            )
+            self._backfill_index()
+
+    def _backfill_index(self) -> None:
+        # documents finished after the index was last saved (e.g. before a crash);
+        # journals written before completeness was checked may hold partial trees,
+        # which `DuplicateReuse.add` refuses
+        index = self.duplicates.index
+        if len(index) < len(self.journal.completed):
+            for record in self.journal.records():
+                if record["id"] not in index:
+                    self.duplicates.add(record["id"], self.formatter(record["example"]), record["response"])
+
+    async def _tag(self, example: dict, taxonomy: Taxonomy, **kwargs) -> dict:
+        key = example.get(self.id_field)
+        document = self.formatter(example)
+        resume = self.journal.partial.get(key)
+        if self.duplicates is not None:
+            reused, prefix = self.duplicates.lookup(document)
+            if reused is not None:
+                return copy.deepcopy(reused)
+            resume = resume or prefix
+        # a failed call raises, so tag_batch reports the document as failed and
+        # the levels decided so far stay in the journal for the next run
+        return await self.tagger(
+            document, taxonomy,
+            resume=resume,
+            on_level=lambda level, path, result: self.journal.record_level(key, level, path, result),
+            raise_errors=True,
+            **kwargs
+        )
+
+    async def run(self, examples: Iterable[dict], max_concurrency: int = 5, **kwargs) -> AsyncIterator[dict]:
+        """
+        Tag every example not finished yet, yielding records like `tag_batch`
+        as they complete. Failed documents are not marked done, so the next
+        run retries them from their last recorded level; stopped ones are
+        final, and yielded with "stopped": True.
+        """
+        finished = self.journal.completed | self.journal.stopped
+        pending = (ex for ex in examples if ex.get(self.id_field) not in finished)
+        try:
+            async for record in tag_batch(
+                pending, self.taxonomy, model=self.model, max_concurrency=max_concurrency,
+                # the example itself reaches `_tag`, which needs its id
+                formatter=lambda example: example, tagger=self._tag, id_field=self.id_field, **kwargs
+            ):
+                if "error" in record:
+                    self.journal.record_error(record["id"], record["error"])
+                elif not is_complete(record["response"], self.taxonomy):
+                    self.journal.record_stopped(record["id"], record["example"], record["response"])
+                    record["stopped"] = True
+                else:
+                    self.journal.record_done(record["id"], record["example"], record["response"])
+                    if self.duplicates is not None:
+                        self.duplicates.add(record["id"], self.formatter(record["example"]), record["response"])
+                yield record
+        finally:
+            if self.duplicates is not None:
+                self.duplicates.index.save(self.index_path)
+
+    def export(self, path: str) -> int:
+        """
+        Write finished records as JSONL (readable by `src.dataset.flatten`).
+        Returns the number of records written.
+        """
+        count = 0
+        with open(path, "w", encoding="utf-8") as out:
+            for record in self.journal.records():
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def close(self) -> None:
+        self.journal.close()
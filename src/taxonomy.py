@@ -1,9 +1,22 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Iterator
+
+
 class TaxonomyNode:
-    def __init__(self, name: str, description: str = "", depth: int = 0):
+    def __init__(self, name: str, description: str = "", depth: int = 0, node_id: str | None = None):
         self.name = name
         self.description = description
         self.children: dict[str, TaxonomyNode] = {}
         self.depth = depth
+        # External identifier of the node, e.g. the ACM CCS concept id ("#10002944").
+        self.node_id = node_id
 
     def add_child(self, child: 'TaxonomyNode') -> None:
         """
@@ -21,12 +34,49 @@ class TaxonomyNode:
         """
         Convert this node and its subtree into a nested dictionary.
         """
-        return {
-            'name': self.name,
-            'description': self.description,
-            'depth': self.depth,
-            'children': [child.to_dict() for child in self.children.values()]
-        }
+        result = {}
+        stack = [(self, result)]
+        while stack:
+            node, data = stack.pop()
+            data.update({
+                'name': node.name,
+                'description': node.description,
+                'depth': node.depth,
+                'children': [{} for _ in node.children]
+            })
+            if node.node_id is not None:
+                data['id'] = node.node_id
+            stack.extend(zip(node.children.values(), data['children']))
+        return result
+
+    def iter_bfs(self) -> 'Iterator[TaxonomyNode]':
+        """
+        Yield this node and its descendants in breadth-first order.
+        """
+        queue = deque([self])
+        while queue:
+            node = queue.popleft()
+            yield node
+            queue.extend(node.children.values())
+
+    def iter_dfs(self) -> 'Iterator[TaxonomyNode]':
+        """
+        Yield this node and its descendants in depth-first pre-order.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children.values()))
+
+    def iter_levels(self) -> 'Iterator[list[TaxonomyNode]]':
+        """
+        Yield the subtree one level at a time, starting with [self].
+        """
+        level = [self]
+        while level:
+            yield level
+            level = [child for node in level for child in node.children.values()]
 
     def find(self, name: str) -> 'TaxonomyNode | None':
         """
@@ -61,40 +111,160 @@ class TaxonomyNode:
         """
         Print the subtree in a human-readable tree format.
         """
-        print(' ' * indent + f"- {self.name} (Depth: {self.depth}): {self.description}")
-        for child in self.children.values():
-            child.print_tree(indent + 4)
+        stack = [(self, indent)]
+        while stack:
+            node, node_indent = stack.pop()
+            print(' ' * node_indent + f"- {node.name} (Depth: {node.depth}): {node.description}")
+            stack.extend((child, node_indent + 4) for child in reversed(node.children.values()))
+
+
+class TaxonomyStats:
+    """
+    Aggregate shape statistics of a Taxonomy, as returned by `Taxonomy.stats`.
+    Levels are node depths (root is level 0).
+    """
+
+    def __init__(self, root: TaxonomyNode):
+        self.node_count = 0
+        self.leaf_count = 0
+        self.max_depth = 0
+        self.level_counts: dict[int, int] = {}
+        # id(node) -> number of nodes in its subtree, itself included
+        self.subtree_sizes: dict[int, int] = {}
+
+        order = list(root.iter_bfs())
+        for node in order:
+            self.node_count += 1
+            self.level_counts[node.depth] = self.level_counts.get(node.depth, 0) + 1
+            if not node.children:
+                self.leaf_count += 1
+                self.max_depth = max(self.max_depth, node.depth)
+        # children come after their parent in BFS order, so walking it backwards
+        # sees every subtree before its root
+        for node in reversed(order):
+            self.subtree_sizes[id(node)] = 1 + sum(
+                self.subtree_sizes[id(child)] for child in node.children.values()
+            )
+
+    def node_added(self, ancestors: list[TaxonomyNode], node: TaxonomyNode) -> None:
+        """
+        Update in place for a new leaf `node` whose root-to-parent chain is `ancestors`.
+        """
+        parent = ancestors[-1]
+        self.node_count += 1
+        self.level_counts[node.depth] = self.level_counts.get(node.depth, 0) + 1
+        # a parent that just got its first child stops being a leaf
+        if len(parent.children) > 1:
+            self.leaf_count += 1
+        self.max_depth = max(self.max_depth, node.depth)
+        self.subtree_sizes[id(node)] = 1
+        for ancestor in ancestors:
+            self.subtree_sizes[id(ancestor)] += 1
+
+    def __repr__(self) -> str:
+        return (f"TaxonomyStats(nodes={self.node_count}, leaves={self.leaf_count}, "
+                f"max_depth={self.max_depth}, level_counts={self.level_counts})")
 
 
 class Taxonomy:
     def __init__(self):
         self.root = TaxonomyNode('root', 'Root of taxonomy', depth=0)
+        # name -> [(node, path from root)] for every node carrying that name, in
+        # registration order. Labels are not unique (ACM CCS reuses e.g.
+        # "Security services"), hence the list.
+        self._index: dict[str, list[tuple[TaxonomyNode, tuple[str, ...]]]] = {}
+        self._register(self.root, (self.root.name,))
+        # computed lazily, kept up to date by add_node, dropped by bulk changes
+        self._stats: TaxonomyStats | None = None
+        # bumped by add_node and reindex, so caches derived from the tree
+        # (e.g. the flat tagger's lexical index) can tell they are stale
+        self.version = 0
+
+    def _register(self, node: TaxonomyNode, path: tuple[str, ...]) -> None:
+        self._index.setdefault(node.name, []).append((node, path))
+
+    def reindex(self) -> None:
+        """
+        Rebuild the name index from the tree. Only needed after attaching nodes
+        directly with `TaxonomyNode.add_child`; `add_node` and `load_from_dict`
+        keep the index up to date themselves.
+        """
+        self._index = {}
+        self._stats = None
+        self.version += 1
+        stack = [(self.root, (self.root.name,))]
+        while stack:
+            node, path = stack.pop()
+            self._register(node, path)
+            # reversed so siblings are registered in insertion (pre-order) order
+            for child in reversed(list(node.children.values())):
+                stack.append((child, path + (child.name,)))
+
+    @property
+    def stats(self) -> TaxonomyStats:
+        """
+        Shape statistics (max depth, per-node subtree sizes, leaf count, per-level
+        node counts), computed once and maintained incrementally by `add_node`.
+        """
+        if self._stats is None:
+            self._stats = TaxonomyStats(self.root)
+        return self._stats
 
     @property
     def depth(self) -> int:
         """
-        Calculate the maximum depth of the taxonomy.
+        The maximum depth of the taxonomy.
         """
-        def get_max_depth(node: TaxonomyNode) -> int:
-            if not node.children:
-                return node.depth
-            return max(get_max_depth(child) for child in node.children.values())
-        return get_max_depth(self.root)
+        return self.stats.max_depth
+
+    @property
+    def leaf_count(self) -> int:
+        return self.stats.leaf_count
 
-    def add_node(self, path: list[str], description: str = "") -> None:
+    @property
+    def level_counts(self) -> dict[int, int]:
+        """
+        Number of nodes at each depth, root included at depth 0.
+        """
+        return dict(self.stats.level_counts)
+
+    def subtree_size(self, node: TaxonomyNode | None = None) -> int:
+        """
+        Number of nodes in the subtree rooted at `node` (the whole taxonomy by default).
+        """
+        return self.stats.subtree_sizes[id(node or self.root)]
+
+    def iter_bfs(self) -> Iterator[TaxonomyNode]:
+        return self.root.iter_bfs()
+
+    def iter_dfs(self) -> Iterator[TaxonomyNode]:
+        return self.root.iter_dfs()
+
+    def iter_levels(self) -> Iterator[list[TaxonomyNode]]:
+        return self.root.iter_levels()
+
+    def add_node(self, path: list[str], description: str = "", node_id: str | None = None) -> None:
         """
         Add a node to the taxonomy under the given path.
         `path` is a list of names leading from root to the new node (including new node name at end).
+        `node_id` optionally records an external identifier on the final node.
         """
+        self.version += 1
         current = self.root
+        ancestors = []
         for i, name in enumerate(path):
+            ancestors.append(current)
             child = current.get_child(name)
             if not child:
                 # The depth of the new node is the depth of its parent + 1
                 child = TaxonomyNode(name, depth=current.depth + 1)
                 current.add_child(child)
+                self._register(child, (self.root.name, *path[:i + 1]))
+                if self._stats is not None:
+                    self._stats.node_added(ancestors, child)
             current = child
         current.description = description or current.description
+        current.node_id = node_id or current.node_id
 
     def get_node(self, path: list[str]) -> TaxonomyNode | None:
         """
@@ -116,15 +286,37 @@ class Taxonomy:
 
     def find(self, name: str) -> TaxonomyNode | None:
         """
-        Global search for a node by name.
+        Global search for a node by name. If several nodes share the name, the
+        first one registered is returned; use `find_all` to get every match.
         """
-        return self.root.find(name)
+        matches = self._index.get(name)
+        return matches[0][0] if matches else None
+
+    def find_all(self, name: str) -> list[TaxonomyNode]:
+        """
+        Return every node carrying the given name.
+        """
+        return [node for node, _ in self._index.get(name, [])]
+
+    def names(self) -> list[str]:
+        """
+        The distinct names of all nodes below the root, in registration order.
+        """
+        return [name for name, matches in self._index.items() if any(len(path) > 1 for _, path in matches)]
 
     def find_path(self, name: str) -> list[str] | None:
         """
         Find the hierarchical path (names) from root to the named node.
+        As with `find`, the first registered match wins; see `find_paths`.
+        """
+        matches = self._index.get(name)
+        return list(matches[0][1]) if matches else None
+
+    def find_paths(self, name: str) -> list[list[str]]:
+        """
+        Return the paths from root of every node carrying the given name.
         """
-        return self.root.find_path(name)
+        return [list(path) for _, path in self._index.get(name, [])]
 
     def to_dict(self) -> dict:
         """
@@ -137,17 +329,22 @@ class Taxonomy:
         Load taxonomy structure from a nested dictionary as produced by `to_dict`.
         """
         def _build(node_data: dict) -> TaxonomyNode:
-            node = TaxonomyNode(
+            return TaxonomyNode(
                 node_data['name'],
                 node_data.get('description', ''),
-                node_data.get('depth', 0)
+                node_data.get('depth', 0),
+                node_data.get('id')
             )
+
+        self.root = _build(data)
+        stack = [(self.root, data)]
+        while stack:
+            node, node_data = stack.pop()
             for child_data in node_data.get('children', []):
                 child_node = _build(child_data)
                 node.add_child(child_node)
-            return node
-
-        self.root = _build(data)
+                stack.append((child_node, child_data))
+        self.reindex()
 
     def print_tree(self) -> None:
         """
@@ -155,6 +352,492 @@ class Taxonomy:
         """
         self.root.print_tree()
 
+    def freeze(self) -> 'FrozenTaxonomy':
+        """
+        Build an immutable, compact array-backed copy of this taxonomy.
+        """
+        return FrozenTaxonomy.from_taxonomy(self)
+
+FROZEN_MAGIC = b'FTAX'
+FROZEN_FORMAT_VERSION = 2
+_HEADER = struct.Struct('<4sHII')  # magic, version, node count, string count
+_STRING_SEPARATOR = '\x00'
+
+
+class FrozenTaxonomyNode:
+    """
+    Lightweight read-only view of one node of a FrozenTaxonomy.
+
+    Exposes the same read attributes as TaxonomyNode (name, description, depth,
+    children, get_child) so the taggers can consume either representation.
+    """
+    __slots__ = ('taxonomy', 'index')
+
+    def __init__(self, taxonomy: 'FrozenTaxonomy', index: int):
+        self.taxonomy = taxonomy
+        self.index = index
+
+    @property
+    def name(self) -> str:
+        return self.taxonomy.strings[self.taxonomy.name_ids[self.index]]
+
+    @property
+    def description(self) -> str:
+        return self.taxonomy.strings[self.taxonomy.description_ids[self.index]]
+
+    @property
+    def depth(self) -> int:
+        return self.taxonomy.depths[self.index]
+
+    @property
+    def node_id(self) -> str | None:
+        return self.taxonomy.strings[self.taxonomy.node_ids[self.index]] or None
+
+    @property
+    def parent(self) -> 'FrozenTaxonomyNode | None':
+        parent = self.taxonomy.parents[self.index]
+        return FrozenTaxonomyNode(self.taxonomy, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> dict[str, 'FrozenTaxonomyNode']:
+        """
+        Direct children keyed by name, in insertion order (built on access).
+        """
+        return {child.name: child for child in self.taxonomy._child_nodes(self.index)}
+
+    def get_child(self, name: str) -> 'FrozenTaxonomyNode | None':
+        """
+        Retrieve a direct child by name.
+        """
+        index = self.taxonomy._child_index(self.index, name)
+        return FrozenTaxonomyNode(self.taxonomy, index) if index >= 0 else None
+
+    def to_dict(self) -> dict:
+        """
+        Convert this node and its subtree into a nested dictionary.
+        """
+        return self.taxonomy._to_dict(self.index)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, FrozenTaxonomyNode)
+                and other.taxonomy is self.taxonomy and other.index == self.index)
+
+    def __hash__(self) -> int:
+        return hash((id(self.taxonomy), self.index))
+
+    def __repr__(self) -> str:
+        return f"FrozenTaxonomyNode({self.name!r}, depth={self.depth})"
+
+
+class FrozenTaxonomy:
+    """
+    Immutable, array-backed form of a Taxonomy, produced by `Taxonomy.freeze()`.
+
+    Nodes are numbered in breadth-first order (root is 0), so the children of a
+    node occupy a contiguous index range. The tree is stored as flat int arrays
+    (parent index, first child index, child count, depth) plus an interned string
+    table that names and descriptions index into. It pickles to a single compact
+    byte string and can be placed in shared memory and attached from worker
+    processes without rebuilding any per-node Python objects.
+    """
+    __slots__ = ('parents', 'child_starts', 'child_counts', 'depths',
+                 'name_ids', 'description_ids', 'node_ids', 'strings', '_name_index', '_shm', '__weakref__')
+
+    # immutable, so derived caches never go stale (see Taxonomy.version)
+    version = 0
+
+    def __init__(self, parents, child_starts, child_counts, depths,
+                 name_ids, description_ids, node_ids, strings: tuple[str, ...]):
+        self.parents = parents
+        self.child_starts = child_starts
+        self.child_counts = child_counts
+        self.depths = depths
+        self.name_ids = name_ids
+        self.description_ids = description_ids
+        self.node_ids = node_ids
+        self.strings = strings
+        self._name_index: dict[str, list[int]] | None = None
+        self._shm = None
+
+    @classmethod
+    def from_taxonomy(cls, taxonomy: 'Taxonomy') -> 'FrozenTaxonomy':
+        parents, child_starts, child_counts, depths = (array('i') for _ in range(4))
+        name_ids, description_ids, node_ids = array('i'), array('i'), array('i')
+        # '' is string 0, used for nodes without an id
+        string_ids: dict[str, int] = {'': 0}
+
+        def _intern(value: str) -> int:
+            if value not in string_ids:
+                string_ids[value] = len(string_ids)
+            return string_ids[value]
+
+        queue = deque([(taxonomy.root, -1)])
+        next_index = 1
+        while queue:
+            node, parent = queue.popleft()
+            parents.append(parent)
+            child_starts.append(next_index)
+            child_counts.append(len(node.children))
+            depths.append(node.depth)
+            name_ids.append(_intern(node.name))
+            description_ids.append(_intern(node.description))
+            node_ids.append(_intern(node.node_id or ''))
+            index = len(parents) - 1
+            for child in node.children.values():
+                queue.append((child, index))
+            next_index += len(node.children)
+
+        strings = tuple(sys.intern(s) for s in string_ids)
+        return cls(parents, child_starts, child_counts, depths,
+                   name_ids, description_ids, node_ids, strings)
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    @property
+    def root(self) -> FrozenTaxonomyNode:
+        return FrozenTaxonomyNode(self, 0)
+
+    @property
+    def depth(self) -> int:
+        """
+        Maximum depth of the taxonomy.
+        """
+        return max(self.depths)
+
+    def node(self, index: int) -> FrozenTaxonomyNode:
+        return FrozenTaxonomyNode(self, index)
+
+    def _child_nodes(self, index: int) -> list[FrozenTaxonomyNode]:
+        start = self.child_starts[index]
+        return [FrozenTaxonomyNode(self, i) for i in range(start, start + self.child_counts[index])]
+
+    def _child_index(self, index: int, name: str) -> int:
+        start = self.child_starts[index]
+        for i in range(start, start + self.child_counts[index]):
+            if self.strings[self.name_ids[i]] == name:
+                return i
+        return -1
+
+    def _path(self, index: int) -> list[str]:
+        path = []
+        while index >= 0:
+            path.append(self.strings[self.name_ids[index]])
+            index = self.parents[index]
+        return path[::-1]
+
+    def get_node(self, path: list[str]) -> FrozenTaxonomyNode | None:
+        """
+        Retrieve a node by its full path list of names.
+        """
+        index = 0
+        for name in path:
+            index = self._child_index(index, name)
+            if index < 0:
+                return None
+        return FrozenTaxonomyNode(self, index)
+
+    def get_children(self, path: list[str] | None = None) -> list[FrozenTaxonomyNode]:
+        """
+        List direct children of the node at the given path (or root if path is None).
+        """
+        node = self.root if path is None else self.get_node(path)
+        return self._child_nodes(node.index) if node else []
+
+    def _lookup(self, name: str) -> list[int]:
+        if self._name_index is None:
+            name_index: dict[str, list[int]] = {}
+            for index, name_id in enumerate(self.name_ids):
+                name_index.setdefault(self.strings[name_id], []).append(index)
+            self._name_index = name_index
+        return self._name_index.get(name, [])
+
+    def names(self) -> list[str]:
+        """
+        The distinct names of all nodes below the root, in breadth-first order.
+        """
+        return list(dict.fromkeys(self.strings[name_id] for name_id in self.name_ids[1:]))
+
+    def find(self, name: str) -> FrozenTaxonomyNode | None:
+        """
+        Global search for a node by name (first match in breadth-first order).
+        """
+        matches = self._lookup(name)
+        return FrozenTaxonomyNode(self, matches[0]) if matches else None
+
+    def find_all(self, name: str) -> list[FrozenTaxonomyNode]:
+        return [FrozenTaxonomyNode(self, index) for index in self._lookup(name)]
+
+    def find_path(self, name: str) -> list[str] | None:
+        """
+        Find the hierarchical path (names, starting at root) to the named node.
+        """
+        matches = self._lookup(name)
+        return self._path(matches[0]) if matches else None
+
+    def find_paths(self, name: str) -> list[list[str]]:
+        return [self._path(index) for index in self._lookup(name)]
+
+    def _to_dict(self, index: int) -> dict:
+        result = {}
+        stack = [(index, result)]
+        while stack:
+            i, out = stack.pop()
+            out.update({
+                'name': self.strings[self.name_ids[i]],
+                'description': self.strings[self.description_ids[i]],
+                'depth': self.depths[i],
+                'children': [{} for _ in range(self.child_counts[i])],
+            })
+            if self.node_ids[i]:
+                out['id'] = self.strings[self.node_ids[i]]
+            start = self.child_starts[i]
+            stack.extend((start + k, child) for k, child in enumerate(out['children']))
+        return result
+
+    def to_dict(self) -> dict:
+        """
+        Convert the entire taxonomy to a nested dictionary (same format as `Taxonomy.to_dict`).
+        """
+        return self._to_dict(0)
+
+    def thaw(self) -> 'Taxonomy':
+        """
+        Rebuild a mutable Taxonomy from this frozen form.
+        """
+        taxonomy = Taxonomy()
+        nodes = [taxonomy.root]
+        taxonomy.root.name = self.strings[self.name_ids[0]]
+        taxonomy.root.description = self.strings[self.description_ids[0]]
+        for i in range(1, len(self)):
+            node = TaxonomyNode(self.strings[self.name_ids[i]],
+                                self.strings[self.description_ids[i]],
+                                self.depths[i],
+                                self.strings[self.node_ids[i]] or None)
+            nodes[self.parents[i]].add_child(node)
+            nodes.append(node)
+        taxonomy.reindex()
+        return taxonomy
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialise into a compact, versioned byte string.
+        """
+        if any(_STRING_SEPARATOR in s for s in self.strings):
+            raise ValueError("Taxonomy strings must not contain NUL characters")
+        parts = [_HEADER.pack(FROZEN_MAGIC, FROZEN_FORMAT_VERSION, len(self), len(self.strings))]
+        for values in (self.parents, self.child_starts, self.child_counts,
+                       self.depths, self.name_ids, self.description_ids, self.node_ids):
+            parts.append(array('i', values).tobytes())
+        # one NUL-separated blob decodes far faster than a length-prefixed string per node
+        parts.append(_STRING_SEPARATOR.join(self.strings).encode('utf-8'))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview, copy: bool = True) -> 'FrozenTaxonomy':
+        """
+        Inverse of `to_bytes`. With copy=False the int arrays are memoryviews over
+        `data` (e.g. a shared-memory buffer) instead of private copies.
+        """
+        view = memoryview(data)
+        magic, version, n_nodes, n_strings = _HEADER.unpack_from(view, 0)
+        if magic != FROZEN_MAGIC or version != FROZEN_FORMAT_VERSION:
+            raise ValueError(f"Not a frozen taxonomy (format {version}) buffer")
+        offset = _HEADER.size
+        item = array('i').itemsize
+
+        def _read_ints(count: int):
+            nonlocal offset
+            chunk = view[offset:offset + count * item].cast('i')
+            offset += count * item
+            return array('i', chunk) if copy else chunk
+
+        ints = [_read_ints(n_nodes) for _ in range(7)]
+        strings = tuple(map(sys.intern, str(view[offset:], 'utf-8').split(_STRING_SEPARATOR)))
+        view.release()
+        if len(strings) != n_strings:
+            raise ValueError("Corrupt frozen taxonomy string table")
+        return cls(*ints, strings)
+
+    def __reduce__(self):
+        return FrozenTaxonomy.from_bytes, (self.to_bytes(),)
+
+    def share(self, name: str | None = None) -> shared_memory.SharedMemory:
+        """
+        Copy the serialised taxonomy into a new shared-memory block and return it.
+        The caller owns the block (close() and unlink() it when the run is over);
+        workers attach to it by name with `FrozenTaxonomy.attach`.
+        """
+        data = self.to_bytes()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return shm
+
+    @classmethod
+    def attach(cls, name: str) -> 'FrozenTaxonomy':
+        """
+        Open a taxonomy published with `share` without copying its arrays.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        frozen = cls.from_bytes(shm.buf, copy=False)
+        # keep the mapping alive for as long as the views into it are
+        frozen._shm = shm
+        return frozen
+
+    def close(self) -> None:
+        """
+        Detach from shared memory (no-op for taxonomies that own their arrays).
+        The taxonomy must not be used afterwards.
+        """
+        if self._shm is None:
+            return
+        for values in (self.parents, self.child_starts, self.child_counts,
+                       self.depths, self.name_ids, self.description_ids, self.node_ids):
+            values.release()
+        self._shm.close()
+        self._shm = None
+
+
+TAXONOMY_SNAPSHOT_MAGIC = b'TXSNAP'
+TAXONOMY_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('<6sHI')  # magic, version, fingerprint length
+
+
+def build_taxonomy_from_json(hierarchy: list[dict], descriptions: dict[str, str]) -> Taxonomy:
+    """
+    Build a Taxonomy from an ACM-CCS-style hierarchy (nested {"id", "label",
+    "children"} dicts) in a single iterative pass. Nodes are attached directly
+    to their parent instead of re-walking the tree from the root for each one.
+    A node's description falls back to its label when it has none.
+    """
+    taxonomy = Taxonomy()
+    root = taxonomy.root
+    # (parent, parent path, item), popped in pre-order
+    stack = [(root, (root.name,), item) for item in reversed(hierarchy)]
+    while stack:
+        parent, parent_path, item = stack.pop()
+        label = item['label']
+        description = descriptions.get(label, label)
+        node = parent.get_child(label)
+        path = parent_path + (label,)
+        if node is None:
+            node = TaxonomyNode(label, description, parent.depth + 1, item.get('id'))
+            parent.add_child(node)
+            taxonomy._register(node, path)
+        else:
+            # same label twice under one parent: merge, as add_node would
+            node.description = description or node.description
+            node.node_id = item.get('id') or node.node_id
+        stack.extend((node, path, child) for child in reversed(item.get('children', [])))
+    return taxonomy
+
+
+def _file_fingerprint(path: str, with_hash: bool = True) -> dict:
+    stat = os.stat(path)
+    fingerprint = {'path': os.path.basename(path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    if with_hash:
+        with open(path, 'rb') as f:
+            fingerprint['sha256'] = hashlib.sha256(f.read()).hexdigest()
+    return fingerprint
+
+
+def _snapshot_is_fresh(recorded: list[dict], sources: list[str]) -> bool:
+    """
+    A snapshot is fresh when every source file has the recorded mtime and size,
+    or, failing that, still has the recorded content hash (e.g. after a checkout
+    that only touched the mtime).
+    """
+    if len(recorded) != len(sources):
+        return False
+    for fingerprint, path in zip(recorded, sources):
+        current = _file_fingerprint(path, with_hash=False)
+        if (current['mtime_ns'], current['size']) == (fingerprint['mtime_ns'], fingerprint['size']):
+            continue
+        if _file_fingerprint(path)['sha256'] != fingerprint['sha256']:
+            return False
+    return True
+
+
+def read_taxonomy_snapshot(snapshot_path: str, sources: list[str]) -> FrozenTaxonomy | None:
+    """
+    Load a snapshot written by `write_taxonomy_snapshot`. Returns None when it
+    is missing, of another format version, or stale with respect to `sources`.
+    """
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < _SNAPSHOT_HEADER.size:
+        return None
+    magic, version, header_length = _SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != TAXONOMY_SNAPSHOT_MAGIC or version != TAXONOMY_SNAPSHOT_VERSION:
+        return None
+    start = _SNAPSHOT_HEADER.size
+    try:
+        recorded = json.loads(data[start:start + header_length])
+        if not _snapshot_is_fresh(recorded, sources):
+            return None
+        return FrozenTaxonomy.from_bytes(data[start + header_length:])
+    except (ValueError, KeyError, OSError, struct.error):
+        return None
+
+
+def write_taxonomy_snapshot(snapshot_path: str, frozen: FrozenTaxonomy, sources: list[str]) -> None:
+    """
+    Atomically write a versioned binary snapshot of `frozen`, fingerprinted
+    with the mtime, size and SHA-256 of each source file.
+    """
+    header = json.dumps([_file_fingerprint(path) for path in sources]).encode('utf-8')
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(TAXONOMY_SNAPSHOT_MAGIC, TAXONOMY_SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        f.write(frozen.to_bytes())
+    os.replace(tmp_path, snapshot_path)
+
+
+def load_taxonomy_from_json(
+    hierarchy_path: str,
+    description_path: str,
+    snapshot_path: str | None = None,
+    use_snapshot: bool = True,
+    frozen: bool = False
+) -> 'Taxonomy | FrozenTaxonomy':
+    """
+    Load the taxonomy described by `acm_ccs_hierarchy.json` + `label_description.json`.
+
+    On the first call the JSON files are parsed and the tree is built in one
+    pass; a binary snapshot is then written next to the hierarchy file (or to
+    `snapshot_path`). Later calls load the snapshot instead, as long as neither
+    source file changed.
+
+    Args:
+        hierarchy_path: Path to the nested hierarchy JSON.
+        description_path: Path to the label -> description JSON.
+        snapshot_path: Where to keep the snapshot. Defaults to `<hierarchy_path>.snapshot`.
+        use_snapshot: Set to False to always build from the JSON files.
+        frozen: Return the FrozenTaxonomy instead of a mutable Taxonomy.
+    """
+    sources = [hierarchy_path, description_path]
+    snapshot_path = snapshot_path or hierarchy_path + '.snapshot'
+
+    result = read_taxonomy_snapshot(snapshot_path, sources) if use_snapshot else None
+    if result is None:
+        with open(hierarchy_path) as f:
+            hierarchy = json.load(f)
+        with open(description_path) as f:
+            descriptions = json.load(f)
+        taxonomy = build_taxonomy_from_json(hierarchy, descriptions)
+        if not use_snapshot:
+            return taxonomy.freeze() if frozen else taxonomy
+        result = taxonomy.freeze()
+        write_taxonomy_snapshot(snapshot_path, result, sources)
+        if not frozen:
+            return taxonomy
+    return result if frozen else result.thaw()
+
+
 if __name__ == '__main__':
     # Example usage:
     taxonomy = Taxonomy()
@@ -179,4 +862,8 @@ if __name__ == '__main__':
 
     history_node = taxonomy.get_node(['Humanities', 'History'])
     if history_node:
-        print(f"The depth of the 'History' node is: {history_node.depth}")
\ No newline at end of file
+        print(f"The depth of the 'History' node is: {history_node.depth}")
+
+    frozen = taxonomy.freeze()
+    print(f"\nFrozen: {len(frozen)} nodes, {len(frozen.to_bytes())} bytes, "
+          f"path to 'NLP': {frozen.find_path('NLP')}")
\ No newline at end of file